@@ -1,18 +1,100 @@
-from configparser import ConfigParser
+import os
+import time
+from configparser import ConfigParser, Error
 from os.path import abspath
+from typing import Callable, List, Union
 
 config_filename = 'config.cfg'
 config_path = abspath('./config/' + config_filename)
 
 
 class CFG:
-    def config(self, q):
+    """
+    配置文件只在首次读取与文件被修改后解析，平时直接读取内存中的值。
+    距上次检查超过check_interval秒时才会检查文件的修改时间。
+    """
+    check_interval = 5
+
+    def __init__(self, path: str = config_path):
+        self.path = path
+        self.section: Union[str, None] = None
+        self.values = {}
+        self.mtime = None
+        self.checked = 0
+        self.listeners: List[Callable[[set], None]] = []
+        self.overrides = {}
+        self.load()
+
+    def load(self) -> set:
+        """
+        重新解析配置文件。文件无法解析或没有任何section（如正在被写入）时保留此前读取的值。
+        :return: 发生变化的配置项
+        """
+        try:
+            self.mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.mtime = None
+        self.checked = time.monotonic()
         cp = ConfigParser()
-        cp.read(config_path)
         try:
-            section = cp.sections()[0]
-            value = cp.get(section, q)
-        except Exception:
+            cp.read(self.path)
+        except Error:
+            if self.section is not None:
+                return set()
+        sections = cp.sections()
+        if not sections and self.section is not None:
+            return set()
+        self.section = sections[0] if sections else None
+        values = {}
+        if self.section is not None:
+            for option in cp.options(self.section):
+                try:
+                    values[option] = cp.get(self.section, option)
+                except Exception:
+                    pass
+        values.update(self.overrides)
+        changed = {k for k in set(values) | set(self.values) if values.get(k) != self.values.get(k)}
+        self.values = values
+        if changed:
+            for listener in self.listeners:
+                listener(changed)
+        return changed
+
+    def check(self):
+        now = time.monotonic()
+        if now - self.checked < self.check_interval:
+            return
+        self.checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.load()
+
+    def override(self, q, value: str):
+        """
+        在内存中覆盖一个配置项（不写入文件），重新加载后仍然有效。用于测试等场景。
+        """
+        self.overrides[q.lower()] = value
+        self.values[q.lower()] = value
+
+    def add_listener(self, listener: Callable[[set], None]):
+        """
+        :param listener: 配置重新加载且有变化时调用，参数为发生变化的配置项。
+        """
+        self.listeners.append(listener)
+
+    def get(self, q) -> Union[str, None]:
+        """
+        :return: 配置项的原始文本，不存在时返回None
+        """
+        self.check()
+        return self.values.get(q.lower())
+
+    def config(self, q):
+        value = self.get(q)
+        if value is None:
             return False
         if value.upper() == 'TRUE':
             return True
@@ -20,7 +102,33 @@ class CFG:
             return False
         return value
 
+    def get_str(self, q, default: str = None) -> Union[str, None]:
+        value = self.get(q)
+        return default if value in (None, '') else value
+
+    def get_bool(self, q, default: bool = False) -> bool:
+        value = self.get(q)
+        if value is not None:
+            if value.upper() == 'TRUE':
+                return True
+            if value.upper() == 'FALSE':
+                return False
+        return default
+
+    def get_int(self, q, default: int = None) -> Union[int, None]:
+        try:
+            return int(self.get(q))
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, q, default: float = None) -> Union[float, None]:
+        try:
+            return float(self.get(q))
+        except (TypeError, ValueError):
+            return default
+
 
-Config = CFG().config
+cfg = CFG()
+Config = cfg.config
 CachePath = Config('cache_path')
 DBPath = Config('db_path')
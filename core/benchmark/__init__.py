@@ -0,0 +1,28 @@
+'''离线性能测试，各模块可直接以python -m core.benchmark.<name>运行。'''
+import time
+from typing import Callable, Dict
+
+
+def timeit(func: Callable, number: int = 10000, repeat: int = 5) -> float:
+    '''
+    多次运行func并取最快的一轮。
+
+    :param func: 需要测试的无参函数。
+    :param number: 每轮的调用次数。
+    :param repeat: 轮数。
+    :returns: 每次调用的平均耗时（秒）。
+    '''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number
+
+
+def report(results: Dict[str, float]):
+    width = max(len(x) for x in results)
+    for name, seconds in results.items():
+        print(f'{name:<{width}}  {seconds * 1e6:10.2f} us')
@@ -0,0 +1,95 @@
+'''
+HTML2Text的吞吐量测试。
+
+用法：python -m core.benchmark.html2text [page.html ...] [--repeat N] [--dump DIR]
+
+可传入从wiki保存的页面（如action=parse&prop=text的输出）测量实际的吞吐量。
+仓库中不附带真实的wiki页面（页面内容有版权且会随时间变化），未指定页面时使用generate_page()生成的合成页面：
+它模仿MediaWiki解析器输出的结构（信息框、标题、段落、列表、引用、脚注等），但文本是随机拼接的，
+结果只适合比较两个版本的相对快慢，不代表实际页面的吞吐量。
+--dump会将每个页面的转换结果写入DIR，便于比较两个版本的输出。
+'''
+import argparse
+import os
+import random
+import time
+from typing import Callable, Dict
+
+from core.html2text import HTML2Text
+
+
+def generate_page(sections: int = 300, seed: int = 0) -> str:
+    """
+    :return: 合成的类似MediaWiki输出的页面，相同的参数总是生成相同的页面
+    """
+    rnd = random.Random(seed)
+    inline = [
+        "text", "wiki", "页面", "内容", "&amp;", "&nbsp;", "&#8212;", "1.", "- x", "+ y",
+        '<a href="/wiki/Page" title="Page">link</a>',
+        '<a href="https://example.com/">https://example.com/</a>',
+        "<b>bold</b>", "<i>italic</i>", "<code>code</code>", '<span class="x">span</span>',
+        '<sup class="reference"><a href="#cite-1">[1]</a></sup>', "<br>",
+    ]
+    parts = ['<div class="mw-parser-output"><table class="infobox"><tr><th>Key</th>'
+             '<td>Value <img src="/images/a.png" alt="A" width="20"></td></tr></table>']
+    for i in range(sections):
+        parts.append('<h2><span class="mw-headline" id="S{0}">Section {0}</span></h2>'.format(i))
+        parts.append("<p>" + " ".join(rnd.choice(inline) for _ in range(120)) + ".</p>")
+        parts.append("<ul><li>one</li><li>two <ul><li>nested</li></ul></li></ul>")
+        parts.append("<ol><li>first</li><li>second</li></ol>")
+        parts.append("<blockquote><p>quote</p></blockquote><pre>pre\n  formatted</pre>")
+        parts.append("<dl><dt>term</dt><dd>definition</dd></dl><hr>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def configurations() -> Dict[str, Callable[[], HTML2Text]]:
+    def default() -> HTML2Text:
+        return HTML2Text()
+
+    def wiki() -> HTML2Text:
+        # 与modules/_wiki使用的选项相同
+        h = HTML2Text()
+        h.ignore_links = True
+        h.ignore_images = True
+        h.ignore_tables = True
+        h.single_line_break = True
+        return h
+
+    return {"default": default, "wiki": wiki}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="HTML files to convert")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dump", help="directory to write the converted text to")
+    args = parser.parse_args()
+
+    pages = {}
+    for path in args.pages:
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    if not pages:
+        pages["generated"] = generate_page()
+
+    for name, html in pages.items():
+        size = len(html.encode("utf-8")) / 1024 / 1024
+        for conf, factory in configurations().items():
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                text = factory().handle(html)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print("{:<24} {:<8} {:8.2f} MB {:8.3f} s {:8.2f} MB/s".format(
+                name, conf, size, best, size / best))
+            if args.dump:
+                os.makedirs(args.dump, exist_ok=True)
+                with open(os.path.join(args.dump, "{}.{}.txt".format(name, conf)), "w",
+                          encoding="utf-8") as f:
+                    f.write(text)
+
+
+if __name__ == "__main__":
+    main()
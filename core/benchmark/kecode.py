@@ -0,0 +1,24 @@
+'''match_kecode的性能测试，覆盖机器人常见的回复消息。'''
+from core.elements.message.chain import match_kecode, MessageChain
+from . import timeit, report
+
+messages = {
+    'short': '已完成。',
+    'help': '\n'.join(f'~module{i} <arg> [<optional>] - 一段较长的命令帮助说明文字' for i in range(30)),
+    'wiki': 'https://minecraft.fandom.com/zh/wiki/Minecraft\nMinecraft是一款沙盒游戏，' * 3,
+    'kecode': '出现错误：404[Ke:Image,path=https://http.cat/404.jpg]',
+    'kecode_many': ''.join(f'第{i}行[Ke:plain,text=内容{i}]\n' for i in range(20)),
+}
+
+
+def main():
+    results = {}
+    for name, text in messages.items():
+        results[f'match_kecode/{name}'] = timeit(lambda: match_kecode(text))
+    for name, text in messages.items():
+        results[f'MessageChain/{name}'] = timeit(lambda: MessageChain(text))
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
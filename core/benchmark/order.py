@@ -0,0 +1,198 @@
+'''
+生成模拟的下单数据，并测量查单相关的查询在不同数据量下的用时与SQL语句数。
+
+用法：python -m core.benchmark.order [--sizes 10000,100000,1000000] [--budget N] [--timeout S]
+                                     [--db URL] [--json FILE]
+
+每个数据量都会清空并重新生成module_order_开头的表：仓库数随数据量增长，各仓库的单数按齐普夫分布，
+每个仓库有若干分类与管理员，较早的单大多已完稿。测试分别在最大的仓库（hot）与中位数仓库（typical）上进行。
+默认使用临时的SQLite数据库；--db可指定其他数据库，其中的下单数据会被清空，切勿指向正式环境的数据库。
+单个操作执行的SQL语句超过--budget条或用时超过--timeout秒时会被中止，结果记为“>”。
+'''
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import ujson as json
+
+from config import cfg
+
+words = ['头像', '半身', '全身', '立绘', 'Q版', '表情包', '设定', '三视图', '加急', '返修', '兽人', '龙', '狼', '狐',
+         '猫', '犬', '鸟', '原创', '同人', 'OC', 'fursona', 'ref', 'sketch', 'colored', 'YCH', 'badge']
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    统计执行的SQL语句数，超过预算（语句数或秒数）时中止当前操作。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.budget = None
+        self.deadline = None
+
+    def __call__(self, *args):
+        self.count += 1
+        if self.budget is not None and self.count > self.budget:
+            raise QueryBudgetExceeded
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise QueryBudgetExceeded
+
+    def reset(self, budget: int = None, timeout: float = None):
+        self.count = 0
+        self.budget = budget
+        self.deadline = time.perf_counter() + timeout if timeout is not None else None
+
+
+def generate(session, size: int, seed: int = 0) -> List[dict]:
+    """
+    清空并生成size个单。
+    :return: 各仓库的信息，按单数从多到少排列
+    """
+    from modules.order.orm import OrderInfo, GroupInfo, TargetAdmin, MasterInfo, RepoInfo, CategoryInfo, \
+        DeletedRecord
+    from modules.order.orderbook import order_book
+    from modules.order.search import search_index
+
+    for table in (OrderInfo, GroupInfo, TargetAdmin, MasterInfo, RepoInfo, CategoryInfo, DeletedRecord):
+        session.query(table).delete()
+    session.commit()
+
+    rnd = random.Random(seed)
+    repo_count = max(1, size // 2000)
+    weights = [1 / (rank + 1) for rank in range(repo_count)]
+    total = sum(weights)
+    repos = []
+    for i in range(repo_count):
+        target = f'QQ|Group|{100000 + i}'
+        master = f'QQ|{200000 + i}'
+        repo = RepoInfo(createdBy=target, masterId=master, isNeedClassify=rnd.random() < 0.5,
+                        isAllowMemberQuery=True, defaultOrderNum=rnd.choice([5, 10, 20]))
+        session.add(repo)
+        session.flush()
+        names = ['默认分类'] + rnd.sample(words[:10], rnd.randint(2, 7))
+        categories = []
+        for name in names:
+            category = CategoryInfo(repoId=str(repo.id), name=name)
+            session.add(category)
+            session.flush()
+            categories.append(category.id)
+        repo.defaultCategoryId = categories[0]
+        session.add(GroupInfo(targetId=target, isEnabled=True, bindRepos=f'[{repo.id}]'))
+        session.add(MasterInfo(masterId=master, nickname=f'master{i}'))
+        for j in range(rnd.randint(0, 3)):
+            session.add(TargetAdmin(senderId=f'QQ|{300000 + i * 10 + j}', repoId=repo.id))
+        repos.append({'id': repo.id, 'orders': int(size * weights[i] / total), 'categories': categories,
+                      'names': names})
+    repos[0]['orders'] += size - sum(r['orders'] for r in repos)
+    session.commit()
+
+    rows = []
+    start = datetime.now() - timedelta(days=365)
+    for repo in repos:
+        customers = [f'QQ|{rnd.randint(1000000, 9999999)}' for _ in range(max(1, int(repo['orders'] ** 0.5)))]
+        repo['customers'] = customers
+        for k in range(repo['orders']):
+            customer = rnd.choice(customers)
+            rows.append({'orderId': customer, 'repoId': repo['id'], 'nickname': customer[3:],
+                         'remark': ' '.join(rnd.sample(words, rnd.randint(1, 4))),
+                         'categoryId': rnd.choice(repo['categories']),
+                         # 越早的单越可能已完稿
+                         'finished': rnd.random() < 0.9 * (1 - k / repo['orders']),
+                         'timestamp': start + timedelta(seconds=k)})
+    rnd.shuffle(rows)  # 各仓库的单交错插入，与实际情况相同
+    for i in range(0, len(rows), 20000):
+        session.execute(OrderInfo.__table__.insert(), rows[i:i + 20000])
+    session.commit()
+    search_index.rebuild()
+    order_book.rebuild()
+    return repos
+
+
+def operations(repo: dict) -> Dict[str, tuple]:
+    """
+    :return: 操作名 -> (函数, 参数)
+    """
+    from modules.order.dbutils import OrderDBUtil
+
+    def unwrap(func):
+        return getattr(func, '__wrapped__', func)  # 跳过重试，避免超出预算的操作被执行多次
+
+    query_all = unwrap(OrderDBUtil.Order.query_all)
+    remove_category = unwrap(OrderDBUtil.Category.remove_category)
+    repo_id = [repo['id']]
+    return {
+        'queue (正序)': (query_all, dict(mode=0, repoId=repo_id)),
+        'queue (倒序)': (query_all, dict(mode=1, repoId=repo_id)),
+        'member queue': (query_all, dict(orderId=repo['customers'][0], repoId=repo_id)),
+        'remark search': (query_all, dict(remark=words[0], repoId=repo_id)),
+        'category filter': (query_all, dict(categoryId=repo['categories'][-1], repoId=repo_id)),
+        'list -f': (query_all, dict(showfinished=True, mode=0, repoId=repo_id)),
+        'remove_category': (remove_category, dict(self=OrderDBUtil.Category(repo['id']), name=repo['names'][-1])),
+    }
+
+
+def run(session, counter: QueryCounter, size: int, budget: int, timeout: float) -> List[dict]:
+    start = time.perf_counter()
+    repos = generate(session, size)
+    print(f'generated {size} orders in {len(repos)} repos ({time.perf_counter() - start:.1f} s)')
+    samples = {'hot': repos[0]}
+    if len(repos) > 1:
+        samples['typical'] = repos[len(repos) // 2]
+    results = []
+    for label, repo in samples.items():
+        for name, (func, kwargs) in operations(repo).items():
+            session.expire_all()
+            counter.reset(budget, timeout)
+            start = time.perf_counter()
+            rows = None
+            exceeded = False
+            try:
+                result = func(**kwargs)
+                if hasattr(result, 'queried_infos'):
+                    rows = len(result.queried_infos)
+            except QueryBudgetExceeded:
+                exceeded = True
+            elapsed = time.perf_counter() - start
+            queries = min(counter.count, budget)
+            counter.reset()
+            results.append({'size': size, 'repo': label, 'repo_orders': repo['orders'], 'operation': name,
+                            'rows': rows, 'queries': queries, 'seconds': elapsed, 'exceeded': exceeded})
+            print(f'{size:>9} {label:<8} {repo["orders"]:>8} {name:<16} {"-" if rows is None else rows:>8} '
+                  f'{(">" if exceeded else "") + str(queries):>9} {elapsed:>10.3f}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--budget', type=int, default=5000, help='maximum SQL statements per operation')
+    parser.add_argument('--timeout', type=float, default=60, help='maximum seconds per operation')
+    parser.add_argument('--db', help='database URL, its order tables are wiped')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    cfg.override('db_path', args.db or f'sqlite:///{tempfile.mkdtemp(prefix="bench_")}/order.db')
+    from sqlalchemy import event
+    from database import session
+
+    counter = QueryCounter()
+    event.listen(session.get_bind(), 'before_cursor_execute', counter)
+    print(f'{"size":>9} {"repo":<8} {"orders":>8} {"operation":<16} {"rows":>8} {"queries":>9} {"seconds":>10}')
+    results = []
+    for size in [int(x) for x in args.sizes.split(',')]:
+        results += run(session, counter, size, args.budget, args.timeout)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
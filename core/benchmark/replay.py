@@ -0,0 +1,306 @@
+'''
+回放消息语料，测量parser()的吞吐量、各类消息的延迟分位数与数据库查询次数。
+
+用法：python -m core.benchmark.replay [corpus.jsonl] [--repeat N] [--concurrency N] [--orders N]
+                                      [--latency MS] [--json FILE]
+
+语料每行为一条JSON，如{"type": "查单", "message": "查单 备注3", "sender": "QQ|10001"}，
+sender可省略。未指定语料时使用生成的语料（闲聊、~wiki、[[...]]、下单与查单）。
+运行时使用临时的SQLite数据库（包括消息日志）与本地的MediaWiki API桩服务器，不会修改配置中的数据库，
+也不会访问外部网络（不读取本机IP）。需在机器人根目录下运行。
+'''
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import logging
+import os
+import random
+import tempfile
+import time
+import urllib.parse
+from typing import Dict, List
+
+import ujson as json
+
+from config import cfg
+
+bench_path = tempfile.mkdtemp(prefix='bench_')
+cfg.override('db_path', f'sqlite:///{os.path.join(bench_path, "bench.db")}')
+cfg.override('db_cache', 'False')
+cfg.override('msg_db_path', f'sqlite:///{os.path.join(bench_path, "msg.db")}')
+cfg.override('fetch_ip_secret', 'False')
+
+from aiohttp import web
+from sqlalchemy import event
+
+from core.elements import MsgInfo, Session, PrivateAssets, FinishedSession
+from core.elements.message.chain import MessageChain
+from core.loader import load_modules
+from core.logger import Logger
+from core.parser.message import parser
+from core.unit_test.template import Template
+from database import session
+
+group_id = '1'
+target_id = f'QQ|Group|{group_id}'
+master_id = 'QQ|10000'
+senders = [f'QQ|{10000 + i}' for i in range(50)]
+categories = ['默认分类', '头像', '半身', '全身']
+
+current_counter = contextvars.ContextVar('current_counter', default=None)
+
+
+class BenchSession(Template):
+    """
+    不输出任何内容、不等待输入的控制台会话，发送的消息仍会经过MessageChain处理。
+    """
+
+    class Feature:
+        image = True
+        voice = False
+        embed = False
+        forward = False
+        delete = True
+        wait = True
+        quote = False
+
+    async def sendMessage(self, msgchain, quote=True, disable_secret_check=False) -> FinishedSession:
+        msgchain = MessageChain(msgchain)
+        if not disable_secret_check:
+            msgchain.is_safe
+        return FinishedSession([])
+
+    async def waitConfirm(self, msgchain=None, quote=True):
+        return True
+
+    async def waitAnything(self, msgchain=None, quote=True):
+        return ''
+
+    async def call_api(self, action, **params):
+        if action == 'get_group_member_info':
+            return {'nickname': f'user{params.get("user_id")}', 'role': 'member'}
+        return {}
+
+    async def sleep(self, s):
+        pass
+
+    async def checkPermission(self):
+        return self.target.senderId == master_id
+
+    def checkSuperUser(self):
+        return False
+
+    class Typing:
+        def __init__(self, msg):
+            self.msg = msg
+
+        async def __aenter__(self):
+            pass
+
+        async def __aexit__(self, exc_type, exc_val, exc_tb):
+            pass
+
+
+def new_session(message: str, sender: str) -> BenchSession:
+    return BenchSession(target=MsgInfo(targetId=target_id,
+                                       senderId=sender,
+                                       senderName=sender.split('|')[-1],
+                                       targetFrom='QQ|Group',
+                                       senderFrom='QQ'),
+                        session=Session(message=message, target=group_id, sender=sender.split('|')[-1]))
+
+
+class StubWiki:
+    """
+    仅实现机器人用到的部分MediaWiki API，每次请求可附加固定延迟以模拟网络。
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        q = request.query
+        server = self.url
+        if q.get('meta') == 'siteinfo':
+            return web.json_response({'query': {
+                'general': {'server': server, 'scriptpath': '', 'articlepath': '/wiki/$1', 'sitename': 'Bench Wiki'},
+                'namespaces': {'0': {'id': 0, '*': ''},
+                               '10': {'id': 10, '*': 'Template', 'canonical': 'Template'}},
+                'namespacealiases': [], 'interwikimap': [], 'extensions': [{'name': 'TextExtracts'}]}})
+        if q.get('action') == 'query' and 'titles' in q:
+            title = q['titles']
+            return web.json_response({'query': {'pages': {'1': {
+                'pageid': 1, 'ns': 0, 'title': title, 'lastrevid': 1,
+                'fullurl': f'{server}/wiki/{urllib.parse.quote(title)}',
+                'extract': f'{title}是一个用于性能测试的页面。' * 5}}}})
+        if q.get('list') == 'random':
+            return web.json_response({'query': {'random': [{'id': 1, 'ns': 0, 'title': '随机页面'}]}})
+        return web.json_response({})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/api.php', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def generate_corpus(size: int = 500, seed: int = 0) -> List[dict]:
+    rnd = random.Random(seed)
+    kinds = [('chatter', 40), ('~wiki', 10), ('[[...]]', 10), ('下单', 15), ('查单', 15), ('查单 <备注>', 10)]
+    corpus = []
+    for _ in range(size):
+        kind = rnd.choices([k for k, _ in kinds], weights=[w for _, w in kinds])[0]
+        sender = rnd.choice(senders)
+        if kind == 'chatter':
+            message = rnd.choice(['早上好', '今天也要加油', '哈哈哈哈', '有人在吗？', '图画好了吗', '[CQ:face,id=1]'])
+        elif kind == '~wiki':
+            message = f'~wiki 页面{rnd.randint(1, 100)}'
+        elif kind == '[[...]]':
+            message = f'看看[[页面{rnd.randint(1, 100)}]]和[[页面{rnd.randint(1, 100)}]]'
+        elif kind == '下单':
+            message = f'下单 {rnd.choice(categories)} 备注{rnd.randint(1, 1000)}'
+        elif kind == '查单':
+            message = '查单'
+            sender = rnd.choice([master_id, sender])
+        else:
+            message = f'查单 备注{rnd.randint(1, 1000)}'
+            sender = master_id
+        corpus.append({'type': kind, 'message': message, 'sender': sender})
+    return corpus
+
+
+def load_corpus(path: str) -> List[dict]:
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                record.setdefault('type', record['message'].split(' ')[0])
+                record.setdefault('sender', senders[0])
+                corpus.append(record)
+    return corpus
+
+
+def setup_data(wiki_api: str, orders: int, seed: int = 0):
+    from modules._wiki.dbutils import WikiTargetInfo
+    from modules.order.dbutils import OrderDBUtil
+    from modules.order.orm import OrderInfo
+
+    group = OrderDBUtil.Group(target_id)
+    group.enable(master_id)
+    OrderDBUtil.Master(masterId=master_id).add('master')
+    repo = group.get_bind_repos()[0]
+    category = OrderDBUtil.Category(repo)
+    for name in categories[1:]:
+        category.add_category(name)
+    category_ids = list(category.get_all_category_by_name().values())
+    rnd = random.Random(seed)
+    for i in range(orders):
+        sender = rnd.choice(senders)
+        OrderDBUtil.Order.add(OrderInfo(orderId=sender, repoId=repo, remark=f'备注{rnd.randint(1, 1000)}',
+                                        nickname=sender.split('|')[-1], categoryId=rnd.choice(category_ids)))
+    WikiTargetInfo(target_id).add_start_wiki(wiki_api)
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def replay(corpus: List[dict], repeat: int, concurrency: int) -> (Dict[str, dict], float):
+    results: Dict[str, dict] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(record: dict):
+        async with semaphore:
+            counter = [0]
+            current_counter.set(counter)
+            start = time.perf_counter()
+            try:
+                await parser(new_session(record['message'], record['sender']), require_enable_modules=False)
+            except Exception:
+                Logger.exception(f'Failed to replay {record["message"]}')
+            elapsed = time.perf_counter() - start
+            result = results.setdefault(record['type'], {'latency': [], 'queries': []})
+            result['latency'].append(elapsed)
+            result['queries'].append(counter[0])
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            await asyncio.gather(*[run(record) for record in corpus])
+    return results, time.perf_counter() - start
+
+
+def report(results: Dict[str, dict], elapsed: float) -> dict:
+    total = sum(len(x['latency']) for x in results.values())
+    summary = {'messages': total, 'seconds': elapsed, 'throughput': total / elapsed, 'types': {}}
+    print(f'{total} messages in {elapsed:.2f} s, {total / elapsed:.1f} msg/s')
+    width = max(len(x) for x in results) + 2
+    print(f'{"type":<{width}}{"count":>7}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}')
+    for name, x in sorted(results.items()):
+        row = {'count': len(x['latency']),
+               'p50': percentile(x['latency'], 0.5) * 1000,
+               'p95': percentile(x['latency'], 0.95) * 1000,
+               'p99': percentile(x['latency'], 0.99) * 1000,
+               'queries': sum(x['queries']) / len(x['queries'])}
+        summary['types'][name] = row
+        print(f'{name:<{width}}{row["count"]:>7}{row["p50"]:>10.2f}{row["p95"]:>10.2f}{row["p99"]:>10.2f}'
+              f'{row["queries"]:>9.1f}')
+    return summary
+
+
+def count_query(*args):
+    counter = current_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+async def main():
+    parser_ = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser_.add_argument('corpus', nargs='?', help='JSON lines message corpus')
+    parser_.add_argument('--repeat', type=int, default=1)
+    parser_.add_argument('--concurrency', type=int, default=1)
+    parser_.add_argument('--orders', type=int, default=200, help='orders created before replaying')
+    parser_.add_argument('--latency', type=float, default=0, help='stub wiki latency in milliseconds')
+    parser_.add_argument('--json', help='write the summary to this file')
+    args = parser_.parse_args()
+
+    PrivateAssets.set(os.path.join(bench_path, 'assets'))
+    load_modules()
+    import modules._wiki  # 默认不加载，测试时需要
+
+    Logger.log.setLevel(logging.ERROR)
+    logging.getLogger().setLevel(logging.ERROR)
+    event.listen(session.get_bind(), 'before_cursor_execute', count_query)
+
+    wiki = StubWiki(args.latency / 1000)
+    await wiki.start()
+    try:
+        setup_data(f'{wiki.url}/api.php', args.orders)
+        corpus = load_corpus(args.corpus) if args.corpus else generate_corpus()
+        results, elapsed = await replay(corpus, args.repeat, args.concurrency)
+    finally:
+        await wiki.stop()
+    summary = report(results, elapsed)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,3 +1,16 @@
 from aiocqhttp import CQHttp
 
-bot = CQHttp()
+from core.metrics import onebot_api_seconds, onebot_api_errors_total
+
+
+class Bot(CQHttp):
+    async def call_action(self, action: str, **params):
+        try:
+            with onebot_api_seconds.time(action):
+                return await super().call_action(action, **params)
+        except Exception:
+            onebot_api_errors_total.inc(action)
+            raise
+
+
+bot = Bot()
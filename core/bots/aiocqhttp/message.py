@@ -1,21 +1,24 @@
 import asyncio
 import html
 import re
+import time
 import traceback
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, List, Union
 
-import aiocqhttp.exceptions
 from aiocqhttp import MessageSegment
 
 from core.bots.aiocqhttp.client import bot
 from core.bots.aiocqhttp.message_guild import MessageSession as MessageSessionGuild
+from core.bots.aiocqhttp.send_queue import send_queue, PRIORITY_REPLY, PRIORITY_BROADCAST
 from core.bots.aiocqhttp.tasks import MessageTaskManager, FinishedTasks
+from core.cache import CacheManager
 from core.elements import Plain, Image, MessageSession as MS, MsgInfo, Session, Voice, FetchTarget as FT, \
     ExecutionLockList, FetchedSession as FS, FinishedSession as FinS
 from core.elements.message.chain import MessageChain
 from core.elements.others import confirm_command
 from core.logger import Logger
+from core.metrics import message_send_seconds
 from database import BotDBUtil
 
 
@@ -52,23 +55,31 @@ class MessageSession(MS):
         if not msgchain.is_safe and not disable_secret_check:
             return await self.sendMessage('https://wdf.ink/6Oup')
         count = 0
-        for x in msgchain.asSendable(embed=False):
-            if isinstance(x, Plain):
-                msg = msg + MessageSegment.text(('\n' if count != 0 else '') + x.text)
-            elif isinstance(x, Image):
-                msg = msg + MessageSegment.image(Path(await x.get()).as_uri())
-            elif isinstance(x, Voice):
-                msg = msg + MessageSegment.record(Path(x.path).as_uri())
-            count += 1
-        Logger.info(f'[Bot] -> [{self.target.targetId}]: {msg}')
-        if self.target.targetFrom == 'QQ|Group':
-            try:
-                send = await bot.send_group_msg(group_id=self.session.target, message=msg)
-            except aiocqhttp.exceptions.ActionFailed:
-                msg = msg + MessageSegment.text('（房蜂控）')
-                send = await bot.send_group_msg(group_id=self.session.target, message=msg)
-        else:
-            send = await bot.send_private_msg(user_id=self.session.target, message=msg)
+        files = []  # 发送完成前不能被缓存清理删除的文件
+        try:
+            for x in msgchain.asSendable(embed=False):
+                if isinstance(x, Plain):
+                    msg = msg + MessageSegment.text(('\n' if count != 0 else '') + x.text)
+                elif isinstance(x, Image):
+                    files.append(CacheManager.acquire(await x.get()))
+                    msg = msg + MessageSegment.image(Path(files[-1]).as_uri())
+                elif isinstance(x, Voice):
+                    files.append(CacheManager.acquire(x.path))
+                    msg = msg + MessageSegment.record(Path(x.path).as_uri())
+                count += 1
+            Logger.info(f'[Bot] -> [{self.target.targetId}]: {msg}')
+            # 回复收到的消息优先于推送等主动发送的消息
+            priority = PRIORITY_REPLY if self.session.message else PRIORITY_BROADCAST
+            with message_send_seconds.time(self.target.targetFrom):
+                if self.target.targetFrom == 'QQ|Group':
+                    send = await send_queue.send('send_group_msg', self.target.targetId, msg, priority,
+                                                 group_id=self.session.target)
+                else:
+                    send = await send_queue.send('send_private_msg', self.target.targetId, msg, priority,
+                                                 user_id=self.session.target)
+        finally:
+            for x in files:
+                CacheManager.release(x)
         return FinishedSession([send])
 
     async def waitConfirm(self, msgchain=None, quote=True):
@@ -175,6 +186,50 @@ class FetchedSession(FS):
             self.parent = MessageSession(self.target, self.session)
 
 
+post_message_concurrency = 16
+
+
+class TargetListCache:
+    """
+    缓存机器人所在的群、好友与频道列表，在ttl秒内复用，用于推送前判断目标是否可达。
+    """
+    ttl = 300
+    _ts = 0
+    _lists = {'QQ|Group': set(), 'QQ': set(), 'QQ|Guild': set()}
+    _lock = None
+
+    @staticmethod
+    async def refresh():
+        group_list_raw, friend_list_raw, guild_list_raw = await asyncio.gather(
+            bot.call_action('get_group_list'), bot.call_action('get_friend_list'), bot.call_action('get_guild_list'))
+        channel_lists = await asyncio.gather(
+            *[bot.call_action('get_guild_channel_list', guild_id=g['guild_id'], no_cache=True)
+              for g in guild_list_raw])
+        guild_list = set()
+        for g, channels in zip(guild_list_raw, channel_lists):
+            for channel in channels:
+                if channel['channel_type'] == 1:
+                    guild_list.add(f"{str(g['guild_id'])}|{str(channel['channel_id'])}")
+        TargetListCache._lists = {'QQ|Group': {str(g['group_id']) for g in group_list_raw},
+                                  'QQ': {str(f['user_id']) for f in friend_list_raw},
+                                  'QQ|Guild': guild_list}
+        TargetListCache._ts = time.monotonic()
+
+    @staticmethod
+    async def get() -> Dict[str, set]:
+        if time.monotonic() - TargetListCache._ts >= TargetListCache.ttl:
+            if TargetListCache._lock is None:
+                TargetListCache._lock = asyncio.Lock()
+            async with TargetListCache._lock:
+                if time.monotonic() - TargetListCache._ts >= TargetListCache.ttl:
+                    await TargetListCache.refresh()
+        return TargetListCache._lists
+
+    @staticmethod
+    async def contains(fetched: FetchedSession) -> bool:
+        return str(fetched.session.target) in (await TargetListCache.get())[fetched.target.targetFrom]
+
+
 class FetchTarget(FT):
     name = 'QQ'
 
@@ -188,84 +243,30 @@ class FetchTarget(FT):
     @staticmethod
     async def fetch_target_list(targetList: list) -> List[FetchedSession]:
         lst = []
-        group_list_raw = await bot.call_action('get_group_list')
-        group_list = []
-        for g in group_list_raw:
-            group_list.append(g['group_id'])
-        friend_list_raw = await bot.call_action('get_friend_list')
-        friend_list = []
-        guild_list_raw = await bot.call_action('get_guild_list')
-        guild_list = []
-        for g in guild_list_raw:
-            get_channel_list = await bot.call_action('get_guild_channel_list', guild_id=g['guild_id'])
-            for channel in get_channel_list:
-                if channel['channel_type'] == 1:
-                    guild_list.append(f"{str(g['guild_id'])}|{str(channel['channel_id'])}")
-        for f in friend_list_raw:
-            friend_list.append(f)
         for x in targetList:
             fet = await FetchTarget.fetch_target(x)
-            if fet:
-                if fet.target.targetFrom == 'QQ|Group':
-                    if fet.session.target not in group_list:
-                        continue
-                if fet.target.targetFrom == 'QQ':
-                    if fet.session.target not in friend_list:
-                        continue
-                if fet.target.targetFrom == 'QQ|Guild':
-                    if fet.session.target not in guild_list:
-                        continue
+            if fet and await TargetListCache.contains(fet):
                 lst.append(fet)
         return lst
 
     @staticmethod
     async def post_message(module_name, message, user_list: List[FetchedSession] = None):
-        send_list = []
-        if user_list is not None:
-            for x in user_list:
+        if user_list is None:
+            user_list = await FetchTarget.fetch_target_list(BotDBUtil.Module.get_enabled_this(module_name))
+        semaphore = asyncio.Semaphore(post_message_concurrency)
+
+        async def post(x: FetchedSession):
+            async with semaphore:
                 try:
-                    send = await x.sendDirectMessage(message)
-                    send_list.append(send)
+                    return [await x.sendDirectMessage(message)]
                 except Exception:
                     Logger.error(traceback.format_exc())
-        else:
-            get_target_id = BotDBUtil.Module.get_enabled_this(module_name)
-            group_list_raw = await bot.call_action('get_group_list')
-            group_list = []
-            for g in group_list_raw:
-                group_list.append(g['group_id'])
-            friend_list_raw = await bot.call_action('get_friend_list')
-            friend_list = []
-            for f in friend_list_raw:
-                friend_list.append(f['user_id'])
-            guild_list_raw = await bot.call_action('get_guild_list')
-            guild_list = []
-            for g in guild_list_raw:
-                get_channel_list = await bot.call_action('get_guild_channel_list', guild_id=g['guild_id'],
-                                                         no_cache=True)
-                for channel in get_channel_list:
-                    if channel['channel_type'] == 1:
-                        guild_list.append(f"{str(g['guild_id'])}|{str(channel['channel_id'])}")
-            for x in get_target_id:
-                fetch = await FetchTarget.fetch_target(x)
-                Logger.info(fetch)
-                if fetch:
-                    if fetch.target.targetFrom == 'QQ|Group':
-                        if int(fetch.session.target) not in group_list:
-                            continue
-                    if fetch.target.targetFrom == 'QQ':
-                        if int(fetch.session.target) not in friend_list:
-                            continue
-                    if fetch.target.targetFrom == 'QQ|Guild':
-                        if fetch.session.target not in guild_list:
-                            continue
-                    try:
-                        print(fetch)
-                        send = await fetch.sendDirectMessage(message)
-                        send_list.append(send)
-                        await asyncio.sleep(0.5)
-                    except Exception:
-                        Logger.error(traceback.format_exc())
+                    return []
+
+        # 发送速率由send_queue控制，此处只限制同时等待发送的数量
+        send_list = []
+        for x in await asyncio.gather(*[post(x) for x in user_list]):
+            send_list += x
         return send_list
 
     @staticmethod
@@ -6,11 +6,14 @@ from pathlib import Path
 from aiocqhttp import MessageSegment
 
 from core.bots.aiocqhttp.client import bot
+from core.bots.aiocqhttp.send_queue import send_queue, PRIORITY_REPLY, PRIORITY_BROADCAST
 from core.bots.aiocqhttp.tasks import MessageTaskManager, FinishedTasks
+from core.cache import CacheManager
 from core.elements import Plain, Image, MessageSession as MS, ExecutionLockList, FinishedSession as FinS
 from core.elements.message.chain import MessageChain
 from core.elements.others import confirm_command
 from core.logger import Logger
+from core.metrics import message_send_seconds
 
 
 class FinishedSession(FinS):
@@ -40,19 +43,27 @@ class MessageSession(MS):
         if not msgchain.is_safe and not disable_secret_check:
             return await self.sendMessage('https://wdf.ink/6Oup')
         count = 0
-        for x in msgchain.asSendable(embed=False):
-            if isinstance(x, Plain):
-                msg = msg + MessageSegment.text(('\n' if count != 0 else '') + x.text)
-            elif isinstance(x, Image):
-                msg = msg + MessageSegment.image(Path(await x.get()).as_uri())
-            # elif isinstance(x, Voice):
-            #    msg = msg + MessageSegment.record(Path(x.path).as_uri())
-            count += 1
-        Logger.info(f'[Bot] -> [{self.target.targetId}]: {msg}')
-        Logger.info(self.session.target)
-        match_guild = re.match(r'(.*)\|(.*)', self.session.target)
-        send = await bot.call_action('send_guild_channel_msg', guild_id=int(match_guild.group(1)),
-                                     channel_id=int(match_guild.group(2)), message=msg)
+        files = []  # 发送完成前不能被缓存清理删除的文件
+        try:
+            for x in msgchain.asSendable(embed=False):
+                if isinstance(x, Plain):
+                    msg = msg + MessageSegment.text(('\n' if count != 0 else '') + x.text)
+                elif isinstance(x, Image):
+                    files.append(CacheManager.acquire(await x.get()))
+                    msg = msg + MessageSegment.image(Path(files[-1]).as_uri())
+                # elif isinstance(x, Voice):
+                #    msg = msg + MessageSegment.record(Path(x.path).as_uri())
+                count += 1
+            Logger.info(f'[Bot] -> [{self.target.targetId}]: {msg}')
+            Logger.info(self.session.target)
+            match_guild = re.match(r'(.*)\|(.*)', self.session.target)
+            with message_send_seconds.time(self.target.targetFrom):
+                send = await send_queue.send('send_guild_channel_msg', self.target.targetId, msg,
+                                             PRIORITY_REPLY if self.session.message else PRIORITY_BROADCAST,
+                                             guild_id=int(match_guild.group(1)), channel_id=int(match_guild.group(2)))
+        finally:
+            for x in files:
+                CacheManager.release(x)
 
         return FinishedSession([send])
 
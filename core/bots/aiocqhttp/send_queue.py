@@ -0,0 +1,202 @@
+'''发送消息的队列，按目标与全局限制发送速率，避免触发风控。'''
+import asyncio
+import time
+from collections import deque, OrderedDict
+from typing import Dict, Union
+
+import aiocqhttp.exceptions
+from aiocqhttp import Message, MessageSegment
+
+from core.bots.aiocqhttp.client import bot
+from core.logger import Logger
+from core.tracing import current_trace
+
+PRIORITY_REPLY = 0  # 回复用户的消息
+PRIORITY_BROADCAST = 1  # 推送等主动发送的消息
+
+global_rate, global_burst = 4, 8  # 全局每秒发送条数与突发上限
+target_rate, target_burst = 1, 3  # 每个目标每秒发送条数与突发上限
+max_retry = 3
+retry_backoff = 1  # 首次重试前等待的秒数，之后每次翻倍
+coalesce_max_length = 1000  # 合并后的消息不超过此长度
+max_target_buckets = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.ts = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def delay(self) -> float:
+        """
+        :return: 距离下一个令牌可用还需等待的秒数
+        """
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    async def acquire(self):
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay()
+        self.take()
+
+
+class SendRequest:
+    def __init__(self, action: str, target: str, params: dict, message: Message, priority: int):
+        self.action = action
+        self.target = target
+        self.params = params
+        self.message = message
+        self.priority = priority
+        self.futures = [asyncio.get_event_loop().create_future()]
+
+    @property
+    def coalescable(self) -> bool:
+        return all(seg.type == 'text' for seg in self.message)
+
+    def coalesce(self, other: 'SendRequest') -> bool:
+        """
+        将other合并到此请求中（两者均为发往同一目标的纯文本推送时）。
+        合并的请求得到同一个API返回值（即同一个message_id），回复可能被waitConfirm等撤回，因此不合并。
+        :return: 是否合并成功
+        """
+        if self.priority != PRIORITY_BROADCAST or other.priority != PRIORITY_BROADCAST \
+                or other.action != self.action or other.target != self.target \
+                or not self.coalescable or not other.coalescable:
+            return False
+        if len(self.message.extract_plain_text()) + len(other.message.extract_plain_text()) \
+                >= coalesce_max_length:
+            return False
+        self.message = self.message + MessageSegment.text('\n') + other.message
+        self.futures += other.futures
+        return True
+
+
+class SendQueue:
+    """
+    按优先级发送消息：回复优先于推送，同一目标的消息按入队顺序发送。
+    仍在排队的同一目标的连续纯文本推送会被合并为一条。
+    API返回失败时按指数退避重试，群消息重试时会附加后缀以绕过风控。
+    """
+
+    def __init__(self):
+        self.lanes = {PRIORITY_REPLY: deque(), PRIORITY_BROADCAST: deque()}
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets: OrderedDict = OrderedDict()
+        self.sending: Dict[str, SendRequest] = {}  # 正在发送（或等待重试）的目标
+        self.wakeup: Union[asyncio.Event, None] = None  # 在事件循环中创建
+        self.worker: Union[asyncio.Task, None] = None
+
+    def bucket(self, target: str) -> TokenBucket:
+        bucket = self.buckets.get(target)
+        if bucket is None:
+            bucket = self.buckets[target] = TokenBucket(target_rate, target_burst)
+            if len(self.buckets) > max_target_buckets:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(target)
+        return bucket
+
+    async def send(self, action: str, target: str, message: Message, priority: int = PRIORITY_REPLY,
+                   **params):
+        """
+        将消息加入队列并等待发送完成。
+
+        :param action: 发送使用的API，如send_group_msg。
+        :param target: 目标的标识，同一目标共享速率限制与发送顺序。
+        :param message: 需要发送的消息。
+        :param priority: PRIORITY_REPLY或PRIORITY_BROADCAST。
+        :param params: 除message外调用API所需的参数。
+        :returns: API的返回值。
+        """
+        request = SendRequest(action, target, params, Message(message), priority)
+        lane = self.lanes[priority]
+        if not (lane and lane[-1].coalesce(request)):
+            lane.append(request)
+        if self.wakeup is None:
+            self.wakeup = asyncio.Event()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.ensure_future(self.run())
+        self.wakeup.set()
+        return await request.futures[0]
+
+    def next_request(self):
+        """
+        :return: 可以立即发送的请求，或None与需要等待的秒数
+        """
+        wait = None
+        for lane in self.lanes.values():
+            blocked = set()
+            for request in lane:
+                if request.target in blocked or request.target in self.sending:
+                    blocked.add(request.target)
+                    continue
+                delay = self.bucket(request.target).delay()
+                if delay == 0:
+                    lane.remove(request)
+                    return request, 0
+                blocked.add(request.target)
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def run(self):
+        current_trace.set(None)  # 发送任务不属于触发它的消息，其中的API调用不计入该消息的Trace
+        while any(self.lanes.values()) or self.sending:
+            request, wait = self.next_request()
+            if request is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.global_bucket.acquire()
+            self.bucket(request.target).take()
+            self.sending[request.target] = request
+            asyncio.ensure_future(self.deliver(request))
+
+    async def deliver(self, request: SendRequest):
+        message = request.message
+        try:
+            for attempt in range(max_retry + 1):
+                try:
+                    result = await bot.call_action(request.action, message=message, **request.params)
+                    break
+                except aiocqhttp.exceptions.ActionFailed as e:
+                    if attempt == max_retry:
+                        raise
+                    Logger.warn(f'Failed to send message to {request.target} ({e!r}), retrying...')
+                    if attempt == 0 and request.action == 'send_group_msg':
+                        message = message + MessageSegment.text('（房蜂控）')
+                    await asyncio.sleep(retry_backoff * 2 ** attempt)
+                    await self.global_bucket.acquire()
+                    self.bucket(request.target).take()
+            for future in request.futures:
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for future in request.futures:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            del self.sending[request.target]
+            self.wakeup.set()
+
+    def state(self) -> dict:
+        return {'reply': len(self.lanes[PRIORITY_REPLY]), 'broadcast': len(self.lanes[PRIORITY_BROADCAST]),
+                'sending': len(self.sending)}
+
+
+send_queue = SendQueue()
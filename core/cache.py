@@ -0,0 +1,174 @@
+'''缓存目录的管理，按类别限制占用空间，并在后台清理过期的文件。'''
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from apscheduler.triggers.interval import IntervalTrigger
+
+from config import CachePath
+from core.logger import Logger
+from core.scheduler import Scheduler
+
+cache_path = os.path.abspath(CachePath or './cache/')
+
+
+class CacheCategory:
+    def __init__(self, quota: int, max_age: float):
+        """
+        :param quota: 该类别最多占用的空间（字节）。
+        :param max_age: 文件自上次使用起的最长保留时间（秒）。
+        """
+        self.quota = quota
+        self.max_age = max_age
+
+
+class CacheManager:
+    """
+    记录缓存目录中的文件及其类别，定时删除过期或超出配额的文件。
+    未经track登记的文件（如cache_name()生成的文件）会在扫描时归入misc类别。
+    render等子目录由各自的缓存自行管理，不在此处清理。
+    """
+    categories: Dict[str, CacheCategory] = {
+        'download': CacheCategory(256 * 1024 * 1024, 6 * 3600),
+        'image': CacheCategory(256 * 1024 * 1024, 6 * 3600),
+        'misc': CacheCategory(128 * 1024 * 1024, 3600),
+    }
+    _files: Dict[str, dict] = {}  # 路径 -> {'category': 类别, 'size': 大小, 'ts': 上次使用的时间}
+    _holds: Dict[str, int] = {}  # 路径 -> 正在使用该文件的次数
+    _pending: set = set()  # 使用结束后需要删除的文件
+
+    @staticmethod
+    def track(path: str, category: str = 'misc') -> str:
+        """
+        登记一个缓存文件，重复登记会刷新其使用时间。
+        :return: 文件的绝对路径
+        """
+        path = os.path.abspath(path)
+        if category not in CacheManager.categories:
+            category = 'misc'
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return path
+        CacheManager._files[path] = {'category': category, 'size': size, 'ts': time.time()}
+        return path
+
+    @staticmethod
+    def acquire(path: str) -> str:
+        """
+        标记文件正在使用（如正在发送），使用期间不会被删除。须与release成对调用。
+        """
+        path = os.path.abspath(path)
+        CacheManager._holds[path] = CacheManager._holds.get(path, 0) + 1
+        if path in CacheManager._files:
+            CacheManager._files[path]['ts'] = time.time()
+        return path
+
+    @staticmethod
+    def release(path: str):
+        path = os.path.abspath(path)
+        count = CacheManager._holds.get(path, 0) - 1
+        if count > 0:
+            CacheManager._holds[path] = count
+            return
+        CacheManager._holds.pop(path, None)
+        if path in CacheManager._pending:
+            CacheManager._pending.discard(path)
+            CacheManager._delete(path)
+
+    @staticmethod
+    @contextmanager
+    def hold(*paths: str):
+        paths = [CacheManager.acquire(x) for x in paths]
+        try:
+            yield paths
+        finally:
+            for x in paths:
+                CacheManager.release(x)
+
+    @staticmethod
+    def remove(path: str) -> bool:
+        """
+        删除缓存文件。若文件正在使用，则在使用结束后再删除。
+        :return: 是否已立即删除
+        """
+        path = os.path.abspath(path)
+        if CacheManager._holds.get(path):
+            CacheManager._pending.add(path)
+            return False
+        CacheManager._delete(path)
+        return True
+
+    @staticmethod
+    def _delete(path: str):
+        CacheManager._files.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def scan():
+        """
+        同步缓存目录与记录：登记未记录的文件，移除已不存在的记录。
+        """
+        if not os.path.exists(cache_path):
+            return
+        exists = set()
+        for entry in os.scandir(cache_path):
+            if not entry.is_file() or entry.name.endswith('.part'):
+                continue
+            exists.add(entry.path)
+            if entry.path not in CacheManager._files:
+                stat = entry.stat()
+                CacheManager._files[entry.path] = {'category': 'misc', 'size': stat.st_size, 'ts': stat.st_mtime}
+        for path in list(CacheManager._files):
+            if path not in exists:
+                del CacheManager._files[path]
+
+    @staticmethod
+    def usage() -> dict:
+        """
+        :return: 各类别的文件数、占用空间与配额
+        """
+        usage = {name: {'files': 0, 'size': 0, 'quota': category.quota}
+                 for name, category in CacheManager.categories.items()}
+        for file in CacheManager._files.values():
+            usage[file['category']]['files'] += 1
+            usage[file['category']]['size'] += file['size']
+        return usage
+
+    @staticmethod
+    def evict() -> int:
+        """
+        删除过期的文件，并按使用时间从旧到新删除超出配额的文件，正在使用的文件会被跳过。
+        :return: 删除的文件数
+        """
+        CacheManager.scan()
+        now = time.time()
+        removed = 0
+        for name, category in CacheManager.categories.items():
+            files = sorted(((path, file) for path, file in CacheManager._files.items()
+                            if file['category'] == name), key=lambda x: x[1]['ts'])
+            size = sum(file['size'] for _, file in files)
+            for path, file in files:
+                if CacheManager._holds.get(path):
+                    continue
+                if now - file['ts'] < category.max_age and size <= category.quota:
+                    break
+                CacheManager._delete(path)
+                size -= file['size']
+                removed += 1
+        return removed
+
+
+async def evict_cache():
+    removed = CacheManager.evict()
+    if removed:
+        Logger.info(f'Removed {removed} cache files.')
+
+
+Scheduler.add_job(func=evict_cache, trigger=IntervalTrigger(minutes=10), id='evict_cache', replace_existing=True)
+
+__all__ = ["CacheCategory", "CacheManager"]
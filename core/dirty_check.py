@@ -10,12 +10,25 @@ import json
 import time
 
 import aiohttp
+from apscheduler.triggers.interval import IntervalTrigger
 from tenacity import retry, wait_fixed, stop_after_attempt
 
 from config import Config
 from core.elements import EnableDirtyWordCheck
 from core.logger import Logger
-from database.logging_message import DirtyWordCache
+from core.metrics import external_api_seconds
+from core.scheduler import Scheduler
+from database.logging_message import DirtyWordCache, purge_dirty_word_cache
+
+
+async def purge_cache():
+    count = purge_dirty_word_cache()
+    if count:
+        Logger.info(f'Purged {count} expired dirty word cache(s).')
+
+
+Scheduler.add_job(func=purge_cache, trigger=IntervalTrigger(hours=1), id='purge_dirty_word_cache',
+                  replace_existing=True)
 
 
 def hash_hmac(key, code, sha1):
@@ -130,19 +143,20 @@ async def check(*text) -> list:
         sign = "acs {}:{}".format(accessKeyId, hash_hmac(accessKeySecret, step3, hashlib.sha1))
         headers['Authorization'] = sign
         # 'Authorization': "acs {}:{}".format(accessKeyId, sign)
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post('{}{}'.format(root, url), data=json.dumps(body)) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    print(result)
-                    for item in result['data']:
-                        content = item['content']
-                        for n in call_api_list[content]:
-                            print(n)
-                            query_list.update({n: {content: parse_data(item)}})
-                        DirtyWordCache(content).update(item)
-                else:
-                    raise ValueError(await resp.text())
+        with external_api_seconds.time('aliyun_green'):
+            async with aiohttp.ClientSession(headers=headers) as session:
+                async with session.post('{}{}'.format(root, url), data=json.dumps(body)) as resp:
+                    if resp.status == 200:
+                        result = await resp.json()
+                        print(result)
+                        for item in result['data']:
+                            content = item['content']
+                            for n in call_api_list[content]:
+                                print(n)
+                                query_list.update({n: {content: parse_data(item)}})
+                            DirtyWordCache(content).update(item)
+                    else:
+                        raise ValueError(await resp.text())
     results = []
     print(query_list)
     for x in query_list:
@@ -23,6 +23,7 @@ Contributors (roughly in chronological order):
 
 """
 
+import functools
 import inspect
 import re
 import sys
@@ -353,15 +354,19 @@ class OneOrMore(BranchPattern):
 
 
 class Either(BranchPattern):
+    # index of the child chosen by the last successful match
+    matched_index: Optional[int] = None
+
     def match(self, left: List["Pattern"], collected: List["Pattern"] = None) -> Any:
         collected = [] if collected is None else collected
         outcomes = []
-        for pattern in self.children:
+        for index, pattern in enumerate(self.children):
             matched, _, _ = outcome = pattern.match(left, collected)
             if matched:
-                outcomes.append(outcome)
+                outcomes.append((index, outcome))
         if outcomes:
-            return min(outcomes, key=lambda outcome: len(outcome[1]))
+            self.matched_index, outcome = min(outcomes, key=lambda outcome: len(outcome[1][1]))
+            return outcome
         return False, left, collected
 
 
@@ -645,7 +650,35 @@ def extras(default_help: bool, version: None, options: List[Pattern], docstring:
         sys.exit()
 
 
+@functools.lru_cache(maxsize=256)
+def build_pattern(docstring: str) -> Tuple[str, List[Option], Required]:
+    """Parse the usage and options of `docstring` into a fixed pattern.
+
+    Matching does not modify the pattern, so the result is cached and shared
+    between calls with the same docstring."""
+    usage_sections = parse_section("usage:", docstring)
+    if len(usage_sections) == 0:
+        raise DocoptLanguageError('"usage:" section (case-insensitive) not found. Perhaps missing indentation?')
+    if len(usage_sections) > 1:
+        raise DocoptLanguageError('More than one "usage:" (case-insensitive).')
+    options_pattern = re.compile(r"\n\s*?options:", re.IGNORECASE)
+    if options_pattern.search(usage_sections[0]):
+        raise DocoptExit(
+            "Warning: options (case-insensitive) was found in usage." "Use a blank line between each section..")
+    usage = usage_sections[0]
+    options = parse_defaults(docstring)
+    pattern = parse_pattern(formal_usage(usage), options)
+    pattern_options = set(pattern.flat(Option))
+    for options_shortcut in pattern.flat(OptionsShortcut):
+        doc_options = parse_defaults(docstring)
+        options_shortcut.children = [opt for opt in doc_options if opt not in pattern_options]
+    return usage, options, pattern.fix()
+
+
 class ParsedOptions(dict):
+    # index of the usage line that matched (see docopt)
+    usage_index = 0
+
     def __repr__(self):
         return "{%s}" % ",\n ".join("%r: %r" % i for i in sorted(self.items()))
 
@@ -696,6 +729,7 @@ def docopt(
         A dictionary, where keys are names of command-line elements
         such as e.g. "--verbose" and "<path>", and values are the
         parsed values of those elements. Also supports dot acccess.
+        `usage_index` is the index of the usage line that matched.
     """
     argv = sys.argv[1:] if argvs is None else argvs
     maybe_frame = inspect.currentframe()
@@ -729,27 +763,15 @@ def docopt(
         MAYBE_STORE = next(instrs)
         if MAYBE_STORE and (MAYBE_STORE.opname.startswith("STORE") or MAYBE_STORE.opname.startswith("RETURN")):
             output_value_assigned = True
-    usage_sections = parse_section("usage:", docstring)
-    if len(usage_sections) == 0:
-        raise DocoptLanguageError('"usage:" section (case-insensitive) not found. Perhaps missing indentation?')
-    if len(usage_sections) > 1:
-        raise DocoptLanguageError('More than one "usage:" (case-insensitive).')
-    options_pattern = re.compile(r"\n\s*?options:", re.IGNORECASE)
-    if options_pattern.search(usage_sections[0]):
-        raise DocoptExit(
-            "Warning: options (case-insensitive) was found in usage." "Use a blank line between each section..")
-    DocoptExit.usage = usage_sections[0]
-    options = parse_defaults(docstring)
-    pattern = parse_pattern(formal_usage(DocoptExit.usage), options)
-    pattern_options = set(pattern.flat(Option))
-    for options_shortcut in pattern.flat(OptionsShortcut):
-        doc_options = parse_defaults(docstring)
-        options_shortcut.children = [opt for opt in doc_options if opt not in pattern_options]
+    DocoptExit.usage, options, pattern = build_pattern(docstring)
     parsed_arg_vector = parse_argv(Tokens(argv), list(options), options_first, more_magic)
     extras(default_help, version, parsed_arg_vector, docstring)
-    matched, left, collected = pattern.fix().match(parsed_arg_vector)
+    matched, left, collected = pattern.match(parsed_arg_vector)
     if matched and left == []:
         output_obj = ParsedOptions((a.name, a.value) for a in (pattern.flat() + collected))
+        # With several usage lines the pattern is Required(Either(line, ...))
+        if len(pattern.children) == 1 and isinstance(pattern.children[0], Either):
+            output_obj.usage_index = pattern.children[0].matched_index
         target_parent_frame = parent_frame or magic_parent_frame or doc_parent_frame
         if more_magic and target_parent_frame and not output_value_assigned:
             if not target_parent_frame.f_globals.get("arguments"):
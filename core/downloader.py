@@ -0,0 +1,97 @@
+'''流式下载工具，边下载边写入磁盘并限制文件大小。'''
+import asyncio
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+from typing import Dict
+
+import aiohttp
+import filetype
+
+from config import cfg
+from core.exceptions import DownloadSizeExceeded
+
+default_download_max_size = 32 * 1024 * 1024  # 配置文件中未设置download_max_size时使用（字节）
+sniff_size = 8192  # filetype判断类型所需的文件头长度
+chunk_size = 65536
+max_downloaded = 1024  # 最多记录的已下载url数
+
+downloaded: OrderedDict = OrderedDict()  # url -> 已下载的文件路径，按使用时间从旧到新排列
+downloading: Dict[str, asyncio.Future] = {}  # url -> 正在进行的下载
+
+
+def download_max_size() -> int:
+    """
+    :return: 默认的下载大小上限（字节）
+    """
+    return cfg.get_int('download_max_size', default_download_max_size)
+
+
+async def download(url: str, path: str, headers: dict = None, timeout: int = 20, max_size: int = None,
+                   dedup: bool = False) -> str:
+    """
+    以流的形式下载文件到指定目录，文件扩展名由文件头判断。
+
+    :param url: 需要下载的url。
+    :param path: 保存文件的目录。
+    :param headers: 请求时使用的http头。
+    :param timeout: 超时时间（秒）。
+    :param max_size: 文件大小上限（字节），超过时抛出DownloadSizeExceeded，默认为配置项download_max_size。
+    :param dedup: 是否复用此前下载过的相同url的文件，同时进行的相同下载只会请求一次。
+                  不复用时每次下载都保存为新的文件。
+    :returns: 文件的绝对路径。
+    """
+    if not dedup:
+        return await _download(url, path, headers, timeout, max_size)
+    exists = downloaded.get(url)
+    if exists is not None:
+        if os.path.exists(exists):
+            downloaded.move_to_end(url)
+            return exists
+        del downloaded[url]  # 已被缓存清理删除
+    task = downloading.get(url)
+    if task is None:
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        task = downloading[url] = asyncio.ensure_future(_download(url, path, headers, timeout, max_size, name))
+        task.add_done_callback(lambda _: downloading.pop(url, None))
+    file_path = await asyncio.shield(task)
+    downloaded[url] = file_path
+    downloaded.move_to_end(url)
+    if len(downloaded) > max_downloaded:
+        downloaded.popitem(last=False)
+    return file_path
+
+
+async def _download(url: str, path: str, headers: dict = None, timeout: int = 20, max_size: int = None,
+                    name: str = None) -> str:
+    """
+    :param name: 文件名（不含扩展名），默认为随机的uuid。
+    """
+    if max_size is None:
+        max_size = download_max_size()
+    part = os.path.abspath(os.path.join(path, f'{str(uuid.uuid4())}.part'))
+    try:
+        async with aiohttp.ClientSession(headers=headers) as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.content_length is not None and resp.content_length > max_size:
+                    raise DownloadSizeExceeded(f'{url} is larger than {max_size} bytes')
+                size = 0
+                head = b''
+                with open(part, 'wb') as file:
+                    async for chunk in resp.content.iter_chunked(chunk_size):
+                        size += len(chunk)
+                        if size > max_size:
+                            raise DownloadSizeExceeded(f'{url} is larger than {max_size} bytes')
+                        if len(head) < sniff_size:
+                            head += chunk[:sniff_size - len(head)]
+                        file.write(chunk)
+        kind = filetype.match(head)
+        if kind is None:
+            raise ValueError(f'Unknown file type: {url}')
+        file_path = os.path.abspath(os.path.join(path, f'{name or str(uuid.uuid4())}.{kind.extension}'))
+        os.replace(part, file_path)
+        return file_path
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
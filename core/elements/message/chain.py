@@ -58,36 +58,21 @@ class MessageChain:
         def unsafeprompt(name, secret, text):
             return f'{name} contains unsafe text "{secret}": {text}'
 
-        """for v in self.value:
+        for v in self.value:
             if isinstance(v, Plain):
-                for secret in Secret.list:
-                    if v.text.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Plain', secret, v.text))
-                        return False
+                texts = [('Plain', v.text)]
             elif isinstance(v, Embed):
-                for secret in Secret.list:
-                    if v.title.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Embed.title', secret, v.title))
-                        return False
-                    if v.description.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Embed.description', secret, v.description))
-                        return False
-                    if v.footer.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Embed.footer', secret, v.footer))
-                        return False
-                    if v.author.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Embed.author', secret, v.author))
-                        return False
-                    if v.url.upper().find(secret.upper()) != -1:
-                        Logger.warn(unsafeprompt('Embed.url', secret, v.url))
-                        return False
-                    for f in v.fields:
-                        if f.name.upper().find(secret.upper()) != -1:
-                            Logger.warn(unsafeprompt('Embed.field.name', secret, f.name))
-                            return False
-                        if f.value.upper().find(secret.upper()) != -1:
-                            Logger.warn(unsafeprompt('Embed.field.value', secret, f.value))
-                            return False"""
+                texts = [('Embed.title', v.title), ('Embed.description', v.description),
+                         ('Embed.footer', v.footer), ('Embed.author', v.author), ('Embed.url', v.url)]
+                for f in v.fields or []:
+                    texts += [('Embed.field.name', f.name), ('Embed.field.value', f.value)]
+            else:
+                continue
+            for name, text in texts:
+                secret = Secret.search(text)
+                if secret is not None:
+                    Logger.warn(unsafeprompt(name, secret, text))
+                    return False
         return True
 
     def asSendable(self, embed=True):
@@ -113,62 +98,61 @@ class MessageChain:
 
 
 site_whitelist = ['http.cat']
+kecode_pattern = re.compile(r'\[Ke:.*?]')
 
 
 def match_kecode(text: str) -> List[Union[Plain, Image, Voice, Embed]]:
-    split_all = re.split(r'(\[Ke:.*?])', text)
-    for x in split_all:
-        if x == '':
-            split_all.remove('')
+    if '[Ke:' not in text:
+        return [Plain(text)] if text else []
     elements = []
-    for e in split_all:
-        match = re.match(r'\[Ke:(.*?),(.*)]', e)
-        if not match:
-            if e != '':
-                elements.append(Plain(e))
-        else:
-            element_type = match.group(1).lower()
-            args = re.split(r',|,.\s', match.group(2))
-            for x in args:
-                if x == '':
-                    args.remove('')
-            if element_type == 'plain':
-                for a in args:
-                    ma = re.match(r'(.*?)=(.*)', a)
-                    if ma:
-                        if ma.group(1) == 'text':
-                            elements.append(Plain(ma.group(2)))
-                        else:
-                            elements.append(Plain(a))
-                    else:
-                        elements.append(Plain(a))
-            elif element_type == 'image':
-                for a in args:
-                    ma = re.match(r'(.*?)=(.*)', a)
-                    if ma:
+    pos = 0
+    for m in kecode_pattern.finditer(text):
+        if m.start() > pos:
+            elements.append(Plain(text[pos:m.start()]))
+        pos = m.end()
+        code = m.group(0)
+        element_type, sep, args = code[4:-1].partition(',')
+        if not sep:
+            elements.append(Plain(code))
+            continue
+        element_type = element_type.lower()
+        args = [a for a in args.split(',') if a != '']
+        if element_type == 'plain':
+            for a in args:
+                key, sep, value = a.partition('=')
+                if sep and key == 'text':
+                    elements.append(Plain(value))
+                else:
+                    elements.append(Plain(a))
+        elif element_type == 'image':
+            img = None
+            for a in args:
+                key, sep, value = a.partition('=')
+                if sep:
+                    if key == 'path':
                         img = None
-                        if ma.group(1) == 'path':
-                            parse_url = urlparse(ma.group(2))
-                            if parse_url[0] == 'file' or parse_url[1] in site_whitelist:
-                                img = Image(path=ma.group(2))
-                        if ma.group(1) == 'headers':
-                            img.headers = json.loads(str(base64.b64decode(ma.group(2)), "UTF-8"))
-                        if img is not None:
+                        parse_url = urlparse(value)
+                        if parse_url[0] == 'file' or parse_url[1] in site_whitelist:
+                            img = Image(path=value)
                             elements.append(img)
-                    else:
-                        elements.append(Image(a))
-            elif element_type == 'voice':
-                for a in args:
-                    ma = re.match(r'(.*?)=(.*)', a)
-                    if ma:
-                        if ma.group(1) == 'path':
-                            parse_url = urlparse(ma.group(2))
-                            if parse_url[0] == 'file' or parse_url[1] in site_whitelist:
-                                elements.append(Voice(path=ma.group(2)))
-                        else:
-                            elements.append(Voice(a))
+                    elif key == 'headers' and img is not None:
+                        img.headers = json.loads(str(base64.b64decode(value), "UTF-8"))
+                else:
+                    elements.append(Image(a))
+        elif element_type == 'voice':
+            for a in args:
+                key, sep, value = a.partition('=')
+                if sep:
+                    if key == 'path':
+                        parse_url = urlparse(value)
+                        if parse_url[0] == 'file' or parse_url[1] in site_whitelist:
+                            elements.append(Voice(path=value))
                     else:
                         elements.append(Voice(a))
+                else:
+                    elements.append(Voice(a))
+    if pos < len(text):
+        elements.append(Plain(text[pos:]))
     return elements
 
 
@@ -4,12 +4,13 @@ from os.path import abspath
 from typing import List
 from urllib import parse
 
-import aiohttp
-import filetype
 from PIL import Image as PImage
-from tenacity import retry, stop_after_attempt
+from tenacity import retry, stop_after_attempt, retry_if_not_exception_type
 
 from config import CachePath
+from core.cache import CacheManager
+from core.downloader import download
+from core.exceptions import DownloadSizeExceeded
 
 
 class Plain:
@@ -41,14 +42,18 @@ class Url:
 
 class Image:
     def __init__(self,
-                 path, headers=None):
+                 path, headers=None, dedup: bool = False):
+        """
+        :param dedup: 路径为url时，是否复用此前下载过的相同url的文件。
+        """
         self.need_get = False
         self.path = path
         self.headers = headers
+        self.dedup = dedup
         if isinstance(path, PImage.Image):
             save = f'{CachePath}{str(uuid.uuid4())}.jpg'
             path.convert('RGB').save(save)
-            self.path = save
+            self.path = CacheManager.track(save, 'image')
         elif re.match('^https?://.*', path):
             self.need_get = True
 
@@ -57,17 +62,9 @@ class Image:
             return abspath(await self.get_image())
         return abspath(self.path)
 
-    @retry(stop=stop_after_attempt(3))
+    @retry(stop=stop_after_attempt(3), retry=retry_if_not_exception_type(DownloadSizeExceeded), reraise=True)
     async def get_image(self):
-        url = self.path
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=20)) as req:
-                raw = await req.read()
-                ft = filetype.match(raw).extension
-                img_path = f'{CachePath}{str(uuid.uuid4())}.{ft}'
-                with open(img_path, 'wb+') as image_cache:
-                    image_cache.write(raw)
-                return img_path
+        return CacheManager.track(await download(self.path, CachePath, headers=self.headers, dedup=self.dedup), 'image')
 
 
 class Voice:
@@ -1,10 +1,11 @@
 import os
+import re
 import traceback
-from configparser import ConfigParser
-from os.path import abspath
+from typing import Union
 
 import requests
 
+from config import cfg
 from core.exceptions import ConfigFileNotFound
 from core.logger import Logger
 
@@ -32,11 +33,54 @@ class PrivateAssets:
 
 
 class Secret:
+    """
+    需要防止泄露的文本（配置文件中的凭据、内部地址与本机IP）。
+    所有条目会被编译为一个正则表达式，每段文本只需转为大写后扫描一次。
+    """
     list = []
+    _matcher = None
 
     @staticmethod
     def add(secret):
         Secret.list.append(secret)
+        Secret._matcher = None
+
+    @staticmethod
+    def remove(secret):
+        if secret in Secret.list:
+            Secret.list.remove(secret)
+            Secret._matcher = None
+
+    @staticmethod
+    def compile():
+        secrets = sorted({x.upper() for x in Secret.list if x}, key=len, reverse=True)
+        Secret._matcher = re.compile('|'.join(re.escape(x) for x in secrets)) if secrets else False
+
+    @staticmethod
+    def search(text: str) -> Union[str, None]:
+        """
+        :return: 文本中出现的第一个条目（大写），若不包含任何条目则返回None
+        """
+        if Secret._matcher is None:
+            Secret.compile()
+        if not Secret._matcher or not text:
+            return None
+        match = Secret._matcher.search(text.upper())
+        return match.group(0) if match else None
+
+    @staticmethod
+    def find(message) -> bool:
+        """
+        :param message: 字符串，或由Plain等带有text属性的元素组成的列表。
+        :return: 是否包含需要防止泄露的文本
+        """
+        if isinstance(message, str):
+            return Secret.search(message) is not None
+        if isinstance(message, (list, tuple)):
+            for m in message:
+                if isinstance(getattr(m, 'text', None), str) and Secret.search(m.text) is not None:
+                    return True
+        return False
 
 
 class ErrorMessage:
@@ -51,29 +95,44 @@ class ErrorMessage:
         return self.error_message
 
 
-def load_secret():
-    config_filename = 'config.cfg'
-    config_path = abspath('./config/' + config_filename)
-    cp = ConfigParser()
-    cp.read(config_path)
-    section = cp.sections()
-    if len(section) == 0:
-        raise ConfigFileNotFound(config_path) from None
-    section = section[0]
-    options = cp.options(section)
+secret_options = {'db_path', 'msg_db_path', 'qq_host', 'qq_authkey', 'dc_token', 'tg_token',
+                  'check_accesskeyid', 'check_accesskeysecret', 'web_render', 'arcapi_url'}  # 需要防止泄露的配置项
+config_secrets = {}  # 配置项 -> 已加入Secret的值
+
+
+def add_config_secret(options):
     for option in options:
-        value = cp.get(section, option)
-        if value.upper() not in ['', 'TRUE', 'FALSE']:
+        if option not in secret_options:
+            continue
+        if option in config_secrets:
+            Secret.remove(config_secrets.pop(option))
+        value = cfg.get(option)
+        if value is not None and value.upper() not in ['', 'TRUE', 'FALSE']:
+            config_secrets[option] = value.upper()
             Secret.add(value.upper())
-    try:
-        ip = requests.get('https://api.ip.sb/ip', timeout=10)
-        if ip:
-            Secret.add(ip.text.replace('\n', ''))
-    except:
-        Logger.error(traceback.format_exc())
-        pass
+
+
+def load_secret():
+    if cfg.section is None:
+        raise ConfigFileNotFound(cfg.path) from None
+    add_config_secret(cfg.values)
+    if cfg.get_bool('fetch_ip_secret', True):  # 离线运行（如性能测试）时可关闭
+        try:
+            ip = requests.get('https://api.ip.sb/ip', timeout=10)
+            if ip:
+                Secret.add(ip.text.replace('\n', ''))
+        except:
+            Logger.error(traceback.format_exc())
+            pass
+    Secret.compile()
+
+
+def reload_secret(changed: set):
+    add_config_secret(changed)
+    Secret.compile()
 
 
 load_secret()
+cfg.add_listener(reload_secret)
 
 __all__ = ["confirm_command", "command_prefix", "EnableDirtyWordCheck", "PrivateAssets", "Secret", "ErrorMessage"]
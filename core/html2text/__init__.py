@@ -34,6 +34,20 @@ __version__ = (2020, 1, 16)
 # Support decoded entities with UNIFIABLE.
 
 
+# Tags that handle_tag() reacts to (besides h1-h9); any other tag only
+# resets lastWasList.
+HANDLED_TAGS = frozenset([
+    "p", "div", "br", "hr", "head", "style", "script", "body", "blockquote",
+    "em", "i", "u", "strong", "b", "del", "strike", "s", "kbd", "code", "tt",
+    "abbr", "q", "a", "img", "dl", "dt", "dd", "ol", "ul", "li",
+    "table", "tr", "td", "th", "pre",
+])
+
+
+class _OutputLimitReached(Exception):
+    """Raised by outtextf to abort parsing once max_length is reached."""
+
+
 class HTML2Text(html.parser.HTMLParser):
     def __init__(
         self,
@@ -84,6 +98,9 @@ class HTML2Text(html.parser.HTMLParser):
         self.tag_callback = None
         self.open_quote = config.OPEN_QUOTE  # covered in cli
         self.close_quote = config.CLOSE_QUOTE  # covered in cli
+        # Stop parsing once this many characters have been emitted (None: no
+        # limit). Only honoured by handle().
+        self.max_length = None  # type: Optional[int]
 
         if out is None:
             self.out = self.outtextf
@@ -92,6 +109,8 @@ class HTML2Text(html.parser.HTMLParser):
 
         # empty list to store output characters before they are "joined"
         self.outtextlist = []  # type: List[str]
+        self.outlength = 0
+        self.limit_reached = False
 
         self.quiet = 0
         self.p_p = 0  # number of newline character to print before next output
@@ -140,8 +159,12 @@ class HTML2Text(html.parser.HTMLParser):
         super().feed(data)
 
     def handle(self, data: str) -> str:
-        self.feed(data)
-        self.feed("")
+        try:
+            self.feed(data)
+            self.feed("")
+        except _OutputLimitReached:
+            # Drop the unparsed remainder so that close() does not resume it.
+            self.rawdata = ""
         markdown = self.optwrap(self.finish())
         if self.pad_tables:
             return pad_tables_in_text(markdown)
@@ -152,8 +175,15 @@ class HTML2Text(html.parser.HTMLParser):
         self.outtextlist.append(s)
         if s:
             self.lastWasNL = s[-1] == "\n"
+            if self.max_length is not None and not self.limit_reached:
+                self.outlength += len(s)
+                if self.outlength >= self.max_length:
+                    self.limit_reached = True
+                    raise _OutputLimitReached
 
     def finish(self) -> str:
+        # Whatever is written from here on is only closing markup.
+        self.limit_reached = True
         self.close()
 
         self.pbr()
@@ -170,6 +200,8 @@ class HTML2Text(html.parser.HTMLParser):
         # Clear self.outtextlist to avoid memory leak of its content to
         # the next handling.
         self.outtextlist = []
+        self.outlength = 0
+        self.limit_reached = False
 
         return outtext
 
@@ -309,7 +341,7 @@ class HTML2Text(html.parser.HTMLParser):
         if (
             start
             and self.maybe_automatic_link is not None
-            and tag not in ["p", "div", "style", "dl", "dt"]
+            and tag not in ("p", "div", "style", "dl", "dt")
             and (tag != "img" or self.ignore_images)
         ):
             self.o("[")
@@ -333,17 +365,21 @@ class HTML2Text(html.parser.HTMLParser):
                 )
                 if self.tag_stack:
                     parent_style = self.tag_stack[-1][2]
+        elif tag not in HANDLED_TAGS and not hn(tag):
+            self.lastWasList = False
+            return
 
-        if hn(tag):
+        header = hn(tag)
+        if header:
             self.p()
             if start:
                 self.inheader = True
-                self.o(hn(tag) * "#" + " ")
+                self.o(header * "#" + " ")
             else:
                 self.inheader = False
                 return  # prevent redundant emphasis marks on headers
 
-        if tag in ["p", "div"]:
+        if tag in ("p", "div"):
             if self.google_doc:
                 if start and google_has_height(tag_style):
                     self.p()
@@ -365,7 +401,7 @@ class HTML2Text(html.parser.HTMLParser):
             self.o("* * *")
             self.p()
 
-        if tag in ["head", "style", "script"]:
+        if tag in ("head", "style", "script"):
             if start:
                 self.quiet += 1
             else:
@@ -377,7 +413,7 @@ class HTML2Text(html.parser.HTMLParser):
             else:
                 self.style -= 1
 
-        if tag in ["body"]:
+        if tag == "body":
             self.quiet = 0  # sites like 9rules.com never close <head>
 
         if tag == "blockquote":
@@ -390,13 +426,8 @@ class HTML2Text(html.parser.HTMLParser):
                 self.blockquote -= 1
                 self.p()
 
-        def no_preceding_space(self: HTML2Text) -> bool:
-            return bool(
-                self.preceding_data and re.match(r"[^\s]", self.preceding_data[-1])
-            )
-
-        if tag in ["em", "i", "u"] and not self.ignore_emphasis:
-            if start and no_preceding_space(self):
+        if tag in ("em", "i", "u") and not self.ignore_emphasis:
+            if start and self.no_preceding_space():
                 emphasis = " " + self.emphasis_mark
             else:
                 emphasis = self.emphasis_mark
@@ -405,8 +436,8 @@ class HTML2Text(html.parser.HTMLParser):
             if start:
                 self.stressed = True
 
-        if tag in ["strong", "b"] and not self.ignore_emphasis:
-            if start and no_preceding_space(self):
+        if tag in ("strong", "b") and not self.ignore_emphasis:
+            if start and self.no_preceding_space():
                 strong = " " + self.strong_mark
             else:
                 strong = self.strong_mark
@@ -415,8 +446,8 @@ class HTML2Text(html.parser.HTMLParser):
             if start:
                 self.stressed = True
 
-        if tag in ["del", "strike", "s"]:
-            if start and no_preceding_space(self):
+        if tag in ("del", "strike", "s"):
+            if start and self.no_preceding_space():
                 strike = " ~~"
             else:
                 strike = "~~"
@@ -430,7 +461,7 @@ class HTML2Text(html.parser.HTMLParser):
                 # handle some font attributes, but leave headers clean
                 self.handle_emphasis(start, tag_style, parent_style)
 
-        if tag in ["kbd", "code", "tt"] and not self.pre:
+        if tag in ("kbd", "code", "tt") and not self.pre:
             self.o("`")  # TODO: `` `this` ``
             self.code = not self.code
 
@@ -454,11 +485,6 @@ class HTML2Text(html.parser.HTMLParser):
                 self.o(self.close_quote)
             self.quote = not self.quote
 
-        def link_url(self: HTML2Text, link: str, title: str = "") -> None:
-            url = str(Url(urlparse.urljoin(self.baseurl, link)))
-            # title = ' "{}"'.format(title) if title.strip() else ""
-            self.o("]({url})".format(url=escape_md(url)))
-
         if tag == "a" and not self.ignore_links:
             if start:
                 if (
@@ -487,7 +513,7 @@ class HTML2Text(html.parser.HTMLParser):
                         if self.inline_links:
                             title = a.get("title") or ""
                             title = escape_md(title)
-                            link_url(self, a["href"], title)
+                            self.link_url(a["href"], title)
                         else:
                             i = self.previousIndex(a)
                             if i is not None:
@@ -568,7 +594,7 @@ class HTML2Text(html.parser.HTMLParser):
         if tag == "dd" and not start:
             self.pbr()
 
-        if tag in ["ol", "ul"]:
+        if tag in ("ol", "ul"):
             # Google Docs create sub lists as top level lists
             if not self.list and not self.lastWasList:
                 self.p()
@@ -608,7 +634,7 @@ class HTML2Text(html.parser.HTMLParser):
                     self.o(str(li.num) + ". ")
                 self.start = True
 
-        if tag in ["table", "tr", "td", "th"]:
+        if tag in ("table", "tr", "td", "th"):
             if self.ignore_tables:
                 if tag == "tr":
                     if start:
@@ -621,7 +647,7 @@ class HTML2Text(html.parser.HTMLParser):
             elif self.bypass_tables:
                 if start:
                     self.soft_br()
-                if tag in ["td", "th"]:
+                if tag in ("td", "th"):
                     if start:
                         self.o("<{}>\n\n".format(tag))
                     else:
@@ -643,7 +669,7 @@ class HTML2Text(html.parser.HTMLParser):
                         if self.pad_tables:
                             self.o("</" + config.TABLE_MARKER_FOR_PAD + ">")
                             self.o("  \n")
-                if tag in ["td", "th"] and start:
+                if tag in ("td", "th") and start:
                     if self.split_next_td:
                         self.o("| ")
                     self.split_next_td = True
@@ -658,7 +684,7 @@ class HTML2Text(html.parser.HTMLParser):
                     self.o("|".join(["---"] * self.td_count))
                     self.soft_br()
                     self.table_start = False
-                if tag in ["td", "th"] and start:
+                if tag in ("td", "th") and start:
                     self.td_count += 1
 
         if tag == "pre":
@@ -671,6 +697,17 @@ class HTML2Text(html.parser.HTMLParser):
                     self.out("\n[/code]")
             self.p()
 
+    def no_preceding_space(self) -> bool:
+        return bool(
+            self.preceding_data
+            and config.RE_NOT_WHITESPACE.match(self.preceding_data[-1])
+        )
+
+    def link_url(self, link: str, title: str = "") -> None:
+        url = str(Url(urlparse.urljoin(self.baseurl, link)))
+        # title = ' "{}"'.format(title) if title.strip() else ""
+        self.o("]({url})".format(url=escape_md(url)))
+
     # TODO: Add docstring for these one letter functions
     def pbr(self) -> None:
         "Pretty print has a line break"
@@ -709,7 +746,7 @@ class HTML2Text(html.parser.HTMLParser):
                 # This is a very dangerous call ... it could mess up
                 # all handling of &nbsp; when not handled properly
                 # (see entityref)
-                data = re.sub(r"\s+", r" ", data)
+                data = config.RE_WHITESPACE.sub(" ", data)
                 if data and data[0] == " ":
                     self.space = True
                     data = data[1:]
@@ -811,9 +848,9 @@ class HTML2Text(html.parser.HTMLParser):
             self.preceding_stressed = True
         elif self.preceding_stressed:
             if (
-                re.match(r"[^\s.!?]", data[0])
+                config.RE_NOT_SENTENCE_END.match(data[0])
                 and not hn(self.current_tag)
-                and self.current_tag not in ["a", "code", "pre"]
+                and self.current_tag not in ("a", "code", "pre")
             ):
                 # should match a letter or common punctuation
                 data = " " + data
@@ -890,7 +927,7 @@ class HTML2Text(html.parser.HTMLParser):
         if not self.body_width:
             return text
 
-        result = ""
+        result = []  # type: List[str]
         newlines = 0
         # I cannot think of a better solution for now.
         # To avoid the non-wrap behaviour for entire paras
@@ -915,15 +952,15 @@ class HTML2Text(html.parser.HTMLParser):
                         break_long_words=False,
                         subsequent_indent=indent,
                     )
-                    result += "\n".join(wrapped)
+                    result.append("\n".join(wrapped))
                     if para.endswith("  "):
-                        result += "  \n"
+                        result.append("  \n")
                         newlines = 1
                     elif indent:
-                        result += "\n"
+                        result.append("\n")
                         newlines = 1
                     else:
-                        result += "\n\n"
+                        result.append("\n\n")
                         newlines = 2
                 else:
                     # Warning for the tempted!!!
@@ -931,13 +968,13 @@ class HTML2Text(html.parser.HTMLParser):
                     # line.isspace()
                     # DOES NOT work! Explanations are welcome.
                     if not config.RE_SPACE.match(para):
-                        result += para + "\n"
+                        result.append(para + "\n")
                         newlines = 1
             else:
                 if newlines < 2:
-                    result += "\n"
+                    result.append("\n")
                     newlines += 1
-        return result
+        return "".join(result)
 
 
 def html2text(html: str, baseurl: str = "", bodywidth: Optional[int] = None) -> str:
@@ -54,6 +54,9 @@ USE_AUTOMATIC_LINKS = True
 
 # For checking space-only lines on line 771
 RE_SPACE = re.compile(r"\s\+")
+RE_WHITESPACE = re.compile(r"\s+")
+RE_NOT_WHITESPACE = re.compile(r"[^\s]")
+RE_NOT_SENTENCE_END = re.compile(r"[^\s.!?]")
 
 RE_ORDERED_LIST_MATCHER = re.compile(r"\d+\.\s")
 RE_UNORDERED_LIST_MATCHER = re.compile(r"[-\*\+]\s")
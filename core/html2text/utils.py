@@ -202,14 +202,20 @@ def escape_md_section(text: str, snob: bool = False) -> str:
     """
     Escapes markdown-sensitive characters across whole document sections.
     """
-    text = config.RE_MD_BACKSLASH_MATCHER.sub(r"\\\1", text)
+    # Each pattern needs a literal character to match; skip the substitution
+    # when it is absent, which is the case for most text nodes.
+    if "\\" in text:
+        text = config.RE_MD_BACKSLASH_MATCHER.sub(r"\\\1", text)
 
     if snob:
         text = config.RE_MD_CHARS_MATCHER_ALL.sub(r"\\\1", text)
 
-    text = config.RE_MD_DOT_MATCHER.sub(r"\1\\\2", text)
-    text = config.RE_MD_PLUS_MATCHER.sub(r"\1\\\2", text)
-    text = config.RE_MD_DASH_MATCHER.sub(r"\1\\\2", text)
+    if "." in text:
+        text = config.RE_MD_DOT_MATCHER.sub(r"\1\\\2", text)
+    if "+" in text:
+        text = config.RE_MD_PLUS_MATCHER.sub(r"\1\\\2", text)
+    if "-" in text:
+        text = config.RE_MD_DASH_MATCHER.sub(r"\1\\\2", text)
 
     return text
 
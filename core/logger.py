@@ -1,19 +1,30 @@
 '''基于logging的日志器。'''
+import atexit
+import functools
 import logging
+import logging.handlers
+import queue
 import re
 import sys
 
+from config import cfg
 
 factory = logging.getLogRecordFactory()
 basic_logger_format = "[%(asctime)s][%(botname)s][%(levelname)s][%(pathname)s:%(lineno)d]: %(msg)s"
+botname = re.split(r'[/\\]', sys.path[0])[-1]
+
+
+@functools.lru_cache(maxsize=1024)
+def display_pathname(pathname: str) -> str:
+    for x in sys.path:
+        pathname = pathname.replace(x, '')
+    return pathname.replace('\\', '.').replace('/', '.')[1:]
 
 
 def record_factory(*args, **kwargs):
     record = factory(*args, **kwargs)
-    for x in sys.path:
-        record.pathname = record.pathname.replace(x, '')
-    record.pathname = record.pathname.replace('\\', '.').replace('/', '.')[1:]
-    record.botname = re.split(r'[/\\]', sys.path[0])[-1]
+    record.pathname = display_pathname(record.pathname)
+    record.botname = botname
     return record
 
 
@@ -22,12 +33,18 @@ logging.setLogRecordFactory(record_factory)
 
 class Logginglogger:
     def __init__(self, fmt=basic_logger_format, **kwargs):
+        """
+        :param queue: 为True时由后台线程输出日志，记录日志时不会因输出缓慢而阻塞。
+        """
         logging.basicConfig(
             format=fmt,
             level=logging.INFO if not kwargs.get("debug") else logging.DEBUG
         )
         self.log = logging.getLogger('akaribot.logger')
         self.log.setLevel(logging.INFO)
+        self.listener = None
+        if kwargs.get("queue"):
+            self.use_queue()
 
         self.info = self.log.info
         self.error = self.log.error
@@ -35,5 +52,18 @@ class Logginglogger:
         self.warn = self.log.warning
         self.exception = self.log.exception
 
+    def use_queue(self):
+        """
+        将根日志器的输出交由QueueListener在后台线程处理。
+        """
+        if self.listener is not None:
+            return
+        root = logging.getLogger()
+        log_queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+        root.handlers = [logging.handlers.QueueHandler(log_queue)]
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
 
-Logger = Logginglogger()
+Logger = Logginglogger(queue=cfg.get_bool('log_queue'))
@@ -0,0 +1,204 @@
+'''轻量的运行指标（计数器、直方图与计时器），可导出为Prometheus文本格式。'''
+import asyncio
+import bisect
+import functools
+import time
+from typing import Dict, List, Tuple
+
+from core.tracing import current_trace
+
+default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    labels = [f'{n}="{escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, desc: str, labelnames: tuple = ()):
+        self.name = name
+        self.desc = desc
+        self.labelnames = labelnames
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, value: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {value}'
+                for labels, value in self.values.items()]
+
+
+class Timer:
+    """
+    记录代码块用时的上下文管理器，结束时将秒数写入直方图，并作为span记录到当前的Trace中。
+    """
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: 'Histogram', labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self.start
+        self.histogram.observe(duration, *self.labels)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record(self.histogram.span_name(self.labels), self.start, duration)
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, desc: str, labelnames: tuple = (), buckets: tuple = default_buckets):
+        self.name = name
+        self.desc = desc
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values: Dict[tuple, list] = {}  # 标签 -> [各区间的计数, 总和, 次数, 最大值]
+
+    def observe(self, value: float, *labels):
+        v = self.values.get(labels)
+        if v is None:
+            v = self.values[labels] = [[0] * (len(self.buckets) + 1), 0, 0, 0]
+        v[0][bisect.bisect_left(self.buckets, value)] += 1
+        v[1] += value
+        v[2] += 1
+        if value > v[3]:
+            v[3] = value
+
+    def span_name(self, labels: tuple) -> str:
+        return f'{self.name}:{",".join(str(x) for x in labels)}' if labels else self.name
+
+    def time(self, *labels) -> Timer:
+        return Timer(self, labels)
+
+    def wrap(self, *labels):
+        """
+        记录函数每次调用用时的装饰器，支持协程函数。
+        """
+
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    with Timer(self, labels):
+                        return await func(*args, **kwargs)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    with Timer(self, labels):
+                        return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def quantile(self, labels: tuple, q: float) -> float:
+        """
+        :return: 由区间计数估算的分位数（区间上限）
+        """
+        v = self.values.get(labels)
+        if not v or not v[2]:
+            return 0
+        rank = q * v[2]
+        total = 0
+        for bound, count in zip(self.buckets, v[0]):
+            total += count
+            if total >= rank:
+                return bound
+        return v[3]
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count, _) in self.values.items():
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, le)} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Metrics:
+    """
+    所有指标的注册表。同名指标只会创建一次，模块重新加载后仍沿用原有的数据。
+    """
+    _metrics: Dict[str, object] = {}
+
+    @staticmethod
+    def counter(name: str, desc: str, labelnames: tuple = ()) -> Counter:
+        if name not in Metrics._metrics:
+            Metrics._metrics[name] = Counter(name, desc, labelnames)
+        return Metrics._metrics[name]
+
+    @staticmethod
+    def histogram(name: str, desc: str, labelnames: tuple = (), buckets: tuple = default_buckets) -> Histogram:
+        if name not in Metrics._metrics:
+            Metrics._metrics[name] = Histogram(name, desc, labelnames, buckets)
+        return Metrics._metrics[name]
+
+    @staticmethod
+    def reset():
+        for metric in Metrics._metrics.values():
+            metric.values.clear()
+
+    @staticmethod
+    def render() -> str:
+        """
+        :return: Prometheus文本格式的所有指标
+        """
+        lines = []
+        for metric in Metrics._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.desc}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def summary(top: int = 10) -> List[Tuple[str, int, float, float, float]]:
+        """
+        :return: 按总用时排序的各计时项：(名称, 次数, 平均用时, p95, 最大用时)，单位为毫秒
+        """
+        items = []
+        for metric in Metrics._metrics.values():
+            if not isinstance(metric, Histogram):
+                continue
+            for labels, (_, total, count, maximum) in metric.values.items():
+                name = metric.name + (f'[{",".join(str(x) for x in labels)}]' if labels else '')
+                items.append((total, name, count, total / count * 1000,
+                              metric.quantile(labels, 0.95) * 1000, maximum * 1000))
+        items.sort(reverse=True)
+        return [x[1:] for x in items[:top]]
+
+
+command_seconds = Metrics.histogram('command_seconds', 'Time spent in each stage of the message parser.',
+                                    ('stage',))
+commands_total = Metrics.counter('commands_total', 'Commands executed.', ('module',))
+db_call_seconds = Metrics.histogram('db_call_seconds', 'Time spent in database utility calls.', ('call',))
+db_errors_total = Metrics.counter('db_errors_total', 'Database utility calls that raised.', ('call',))
+external_api_seconds = Metrics.histogram('external_api_seconds', 'Time spent waiting for external APIs.',
+                                         ('api',))
+message_send_seconds = Metrics.histogram('message_send_seconds',
+                                         'Time from queueing an outgoing message until it is sent.', ('platform',))
+onebot_api_seconds = Metrics.histogram('onebot_api_seconds', 'Time spent in OneBot API calls.', ('action',))
+onebot_api_errors_total = Metrics.counter('onebot_api_errors_total', 'OneBot API calls that raised.',
+                                          ('action',))
+
+__all__ = ["Counter", "Histogram", "Timer", "Metrics"]
@@ -7,6 +7,7 @@ from core.docopt import docopt, DocoptExit
 from core.elements import Command, Option, Schedule, StartUp, RegexCommand, command_prefix, MessageSession
 
 command_prefix_first = command_prefix[0]
+sub_args_cache = {}  # (CommandMeta, prefix) -> 该CommandMeta单独的用法
 
 
 class InvalidHelpDocTypeError(BaseException):
@@ -34,10 +35,12 @@ class CommandParser:
             self.bind_prefix = args.bind_prefix
             help_doc_list = []
             none_doc = True
+            self.args_owner = []  # 每行用法所属的CommandMeta
             for match in (args.match_list.set if self.msg is None else args.match_list.get(self.msg.target.targetFrom)):
                 if match.help_doc is not None:
                     none_doc = False
                     help_doc_list = help_doc_list + match.help_doc
+                    self.args_owner += [match] * len(match.help_doc)
                 if match.options_desc is not None:
                     for m in match.options_desc:
                         self.options_desc.append(f'{m}  {match.options_desc[m]}')
@@ -73,6 +76,28 @@ class CommandParser:
         else:
             raise InvalidHelpDocTypeError
 
+    @property
+    def usage_count(self) -> int:
+        """
+        docopt以每行开头的命令名分隔用法，因此在此按同样的方式计数。
+        """
+        tokens = self.args.partition(':')[2].split()
+        return tokens.count(tokens[0]) if tokens else 0
+
+    def parse_sub(self, match, argv: list):
+        """
+        只使用一个CommandMeta的用法解析参数。
+        :return: 解析结果，若不匹配则返回None
+        """
+        sub_args = sub_args_cache.get((match, self.bind_prefix))
+        if sub_args is None:
+            sub_args = sub_args_cache[(match, self.bind_prefix)] = CommandParser(match.help_doc,
+                                                                                prefix=self.bind_prefix).args
+        try:
+            return docopt(sub_args, argvs=argv, default_help=False)
+        except DocoptExit:
+            return None
+
     def return_formatted_help_doc(self) -> str:
         if self.args is None:
             return '（此模块没有帮助信息）'
@@ -115,18 +140,16 @@ class CommandParser:
                     raise InvalidCommandFormatError
                 else:
                     base_match = docopt(self.args, argvs=split_command[1:], default_help=False)
-                    for match in (self.origin_template.match_list.set if self.msg is None else
-                    self.origin_template.match_list.get(self.msg.target.targetFrom)):
-                        if match.help_doc is None:
-                            continue
-                        try:
-                            sub_args = CommandParser(match.help_doc, prefix=self.bind_prefix).args
-                            if sub_args is not None:
-                                get_parse = docopt(sub_args,
-                                                   argvs=split_command[1:], default_help=False)
-                            else:
-                                continue
-                        except DocoptExit:
+                    matches = [match for match in (self.origin_template.match_list.set if self.msg is None else
+                                                   self.origin_template.match_list.get(
+                                                       self.msg.target.targetFrom)) if match.help_doc is not None]
+                    # docopt已记录匹配的是哪一行用法，先尝试该行所属的命令，不符时再逐个尝试
+                    if self.usage_count == len(self.args_owner):
+                        owner = self.args_owner[base_match.usage_index]
+                        matches = [owner] + [match for match in matches if match is not owner]
+                    for match in matches:
+                        get_parse = self.parse_sub(match, split_command[1:])
+                        if get_parse is None:
                             continue
                         correct = True
                         for g in get_parse:
@@ -1,66 +1,61 @@
 import re
 import traceback
+from typing import Union
+
 from aiocqhttp.exceptions import ActionFailed
-from datetime import datetime
 
 from core.elements import MessageSession, Command, command_prefix, ExecutionLockList, RegexCommand, ErrorMessage
 from core.exceptions import AbuseWarning
 from core.loader import ModulesManager
 from core.logger import Logger
+from core.metrics import command_seconds, commands_total
 from core.parser.command import CommandParser, InvalidCommandFormatError, InvalidHelpDocTypeError
+from core.rate_limit import SlidingWindowLimiter, TempBanList
 from core.tos import warn_target
+from core.tracing import Trace
 from core.utils import remove_ineffective_text, RemoveDuplicateSpace
 from database import BotDBUtil
 
 
-counter_same = {}  # 命令使用次数计数（重复使用单一命令）
-counter_all = {}  # 命令使用次数计数（使用所有命令）
+counter_same = SlidingWindowLimiter('counter_same', limit=10, window=300)  # 命令使用次数计数（重复使用单一命令）
+counter_all = SlidingWindowLimiter('counter_all', limit=30, window=300)  # 命令使用次数计数（使用所有命令）
 
-temp_ban_counter = {}  # 临时封禁计数
+temp_ban_counter = TempBanList('temp_ban_counter', duration=300)  # 临时封禁计数
 
 
-async def remove_temp_ban(msg: MessageSession):
-    is_temp_banned = temp_ban_counter.get(msg.target.senderId)
-    if is_temp_banned is not None:
-        del temp_ban_counter[msg.target.senderId]
+async def remove_temp_ban(msg: Union[MessageSession, str]):
+    temp_ban_counter.remove(msg.target.senderId if isinstance(msg, MessageSession) else msg)
 
 
 async def msg_counter(msg: MessageSession, command: str):
-    same = counter_same.get(msg.target.senderId)
-    if same is None or datetime.now().timestamp() - same['ts'] > 300 or same[
-        'command'] != command:  # 检查是否滥用（重复使用同一命令）
-        counter_same[msg.target.senderId] = {'command': command, 'count': 1,
-                                             'ts': datetime.now().timestamp()}
-    else:
-        same['count'] += 1
-        if same['count'] > 10:
-            raise AbuseWarning('一段时间内使用相同命令的次数过多')
-    all_ = counter_all.get(msg.target.senderId)
-    if all_ is None or datetime.now().timestamp() - all_['ts'] > 300:  # 检查是否滥用（重复使用同一命令）
-        counter_all[msg.target.senderId] = {'count': 1,
-                                            'ts': datetime.now().timestamp()}
-    else:
-        all_['count'] += 1
-        if all_['count'] > 30:
-            raise AbuseWarning('一段时间内使用命令的次数过多')
+    if counter_same.hit((msg.target.senderId, command)):  # 检查是否滥用（重复使用同一命令）
+        raise AbuseWarning('一段时间内使用相同命令的次数过多')
+    if counter_all.hit(msg.target.senderId):  # 检查是否滥用（使用所有命令）
+        raise AbuseWarning('一段时间内使用命令的次数过多')
 
 
 async def parser(msg: MessageSession, require_enable_modules: bool = True, prefix: list = None):
     """
-    接收消息必经的预处理器
+    接收消息必经的预处理器，每条消息的处理过程会被记录为一个Trace
     :param msg: 从监听器接收到的dict，该dict将会经过此预处理器传入下游
     :param require_enable_modules: 是否需要检查模块是否已启用
     :param prefix: 使用的命令前缀。如果为None，则使用默认的命令前缀，存在''值的情况下则代表无需命令前缀
     :return: 无返回
     """
-    modules = ModulesManager.return_modules_list_as_dict(msg.target.targetFrom)
-    modulesAliases = ModulesManager.return_modules_alias_map()
-    modulesRegex = ModulesManager.return_specified_type_modules(RegexCommand, targetFrom=msg.target.targetFrom)
-    display = RemoveDuplicateSpace(msg.asDisplay())  # 将消息转换为一般显示形式
-    # Logger.info(f'[{msg.target.senderId}{f" ({msg.target.targetId})" if msg.target.targetFrom != msg.target.senderFrom else ""}] -> [Bot]: {display}')
-    msg.trigger_msg = display
-    msg.target.senderInfo = senderInfo = BotDBUtil.SenderInfo(msg.target.senderId)
-    enabled_modules_list = BotDBUtil.Module(msg).check_target_enabled_module_list()
+    with Trace(msg.target.targetId, msg.target.senderId, msg.asDisplay()):
+        return await parse_message(msg, require_enable_modules, prefix)
+
+
+async def parse_message(msg: MessageSession, require_enable_modules: bool = True, prefix: list = None):
+    with command_seconds.time('prepare'):
+        modules = ModulesManager.return_modules_list_as_dict(msg.target.targetFrom)
+        modulesAliases = ModulesManager.return_modules_alias_map()
+        modulesRegex = ModulesManager.return_specified_type_modules(RegexCommand, targetFrom=msg.target.targetFrom)
+        display = RemoveDuplicateSpace(msg.asDisplay())  # 将消息转换为一般显示形式
+        # Logger.info(f'[{msg.target.senderId}{f" ({msg.target.targetId})" if msg.target.targetFrom != msg.target.senderFrom else ""}] -> [Bot]: {display}')
+        msg.trigger_msg = display
+        msg.target.senderInfo = senderInfo = BotDBUtil.SenderInfo(msg.target.senderId)
+        enabled_modules_list = BotDBUtil.Module(msg).check_target_enabled_module_list()
     if len(display) == 0:
         return
     disable_prefix = False
@@ -113,19 +108,18 @@ async def parser(msg: MessageSession, require_enable_modules: bool = True, prefi
                 try:
                     is_temp_banned = temp_ban_counter.get(msg.target.senderId)
                     if is_temp_banned is not None:
-                        ban_time = datetime.now().timestamp() - is_temp_banned['ts']
-                        if ban_time < 300:
-                            if is_temp_banned['count'] < 2:
-                                is_temp_banned['count'] += 1
-                                return await msg.sendMessage('提示：\n'
-                                                             '由于你的行为触发了警告，我们已对你进行临时封禁。\n'
-                                                             f'距离解封时间还有{str(int(300 - ban_time))}秒。')
-                            elif is_temp_banned['count'] <= 5:
-                                is_temp_banned['count'] += 1
-                                return await msg.sendMessage('即使是触发了临时封禁，继续使用命令还是可能会导致你被再次警告。\n'
-                                                             f'距离解封时间还有{str(int(300 - ban_time))}秒。')
-                            else:
-                                return await warn_target(msg)
+                        ban_time = temp_ban_counter.remaining(msg.target.senderId)
+                        if is_temp_banned['count'] < 2:
+                            is_temp_banned['count'] += 1
+                            return await msg.sendMessage('提示：\n'
+                                                         '由于你的行为触发了警告，我们已对你进行临时封禁。\n'
+                                                         f'距离解封时间还有{str(ban_time)}秒。')
+                        elif is_temp_banned['count'] <= 5:
+                            is_temp_banned['count'] += 1
+                            return await msg.sendMessage('即使是触发了临时封禁，继续使用命令还是可能会导致你被再次警告。\n'
+                                                         f'距离解封时间还有{str(ban_time)}秒。')
+                        else:
+                            return await warn_target(msg)
                     """                    if msg.target.targetFrom != 'QQ|Guild' or command_first_word != 'module':
                                             await msg_counter(msg, msg.trigger_msg)"""
                     module = modules[command_first_word]
@@ -154,9 +148,10 @@ async def parser(msg: MessageSession, require_enable_modules: bool = True, prefi
                             none_doc = False
                     if not none_doc:
                         try:
-                            command_parser = CommandParser(module, msg=msg)
                             try:
-                                parsed_msg = command_parser.parse(msg.trigger_msg)
+                                with command_seconds.time('parse'):
+                                    command_parser = CommandParser(module, msg=msg)
+                                    parsed_msg = command_parser.parse(msg.trigger_msg)
                                 submodule = parsed_msg[0]
                                 msg.parsed_msg = parsed_msg[1]
                                 if submodule.required_superuser:
@@ -168,11 +163,13 @@ async def parser(msg: MessageSession, require_enable_modules: bool = True, prefi
                                         await msg.sendMessage(
                                             f'此命令仅能被该群组的管理员所使用，请联系管理员执行此命令。')
                                         continue
-                                if not senderInfo.query.disable_typing:
-                                    async with msg.Typing(msg):
-                                        await parsed_msg[0].function(msg)  # 将msg传入下游模块
-                                else:
-                                    await parsed_msg[0].function(msg)
+                                commands_total.inc(command_first_word)
+                                with command_seconds.time('execute'):
+                                    if not senderInfo.query.disable_typing:
+                                        async with msg.Typing(msg):
+                                            await parsed_msg[0].function(msg)  # 将msg传入下游模块
+                                    else:
+                                        await parsed_msg[0].function(msg)
                             except InvalidCommandFormatError:
                                 await msg.sendMessage('语法错误。')
                                 module = modules['help']
@@ -189,17 +186,18 @@ async def parser(msg: MessageSession, require_enable_modules: bool = True, prefi
                             continue
                     else:
                         msg.parsed_msg = None
-                        for func in module.match_list.set:
-                            if func.help_doc is None:
-                                if not senderInfo.query.disable_typing:
-                                    async with msg.Typing(msg):
-                                        await func.function(msg)  # 将msg传入下游模块
-                                else:
-                                    await func.function(msg)
+                        commands_total.inc(command_first_word)
+                        with command_seconds.time('execute'):
+                            for func in module.match_list.set:
+                                if func.help_doc is None:
+                                    if not senderInfo.query.disable_typing:
+                                        async with msg.Typing(msg):
+                                            await func.function(msg)  # 将msg传入下游模块
+                                    else:
+                                        await func.function(msg)
                 except AbuseWarning as e:
                     await warn_target(msg, str(e))
-                    temp_ban_counter[msg.target.senderId] = {'count': 1,
-                                                             'ts': datetime.now().timestamp()}
+                    temp_ban_counter.add(msg.target.senderId)
                     return
                 except ActionFailed:
                     await msg.sendMessage('消息发送失败，可能被风控，请稍后再试。')
@@ -243,16 +241,17 @@ async def parser(msg: MessageSession, require_enable_modules: bool = True, prefi
                                 ExecutionLockList.add(msg)
                             else:
                                 return await msg.sendMessage('您有命令正在执行，请稍后再试。')
-                            if rfunc.show_typing and not senderInfo.query.disable_typing:
-                                async with msg.Typing(msg):
+                            commands_total.inc(regex)
+                            with command_seconds.time('execute'):
+                                if rfunc.show_typing and not senderInfo.query.disable_typing:
+                                    async with msg.Typing(msg):
+                                        await rfunc.function(msg)  # 将msg传入下游模块
+                                else:
                                     await rfunc.function(msg)  # 将msg传入下游模块
-                            else:
-                                await rfunc.function(msg)  # 将msg传入下游模块
                         ExecutionLockList.remove(msg)
             except AbuseWarning as e:
                 """await warn_target(msg, str(e))
-                temp_ban_counter[msg.target.senderId] = {'count': 1,
-                                                         'ts': datetime.now().timestamp()}
+                temp_ban_counter.add(msg.target.senderId)
                 return"""
             except ActionFailed:
                 await msg.sendMessage('消息发送失败，可能被风控，请稍后再试。')
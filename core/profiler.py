@@ -0,0 +1,109 @@
+'''对运行中的事件循环进行采样分析，无需重启或挂载外部分析器。'''
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from core.cache import CacheManager, cache_path
+from core.logger import display_pathname
+
+
+handle_run = asyncio.Handle._run.__code__
+run_once = asyncio.BaseEventLoop._run_once.__code__
+idle_frame = ('', 0, '<idle>')
+
+
+class SamplingProfiler:
+    """
+    在后台线程中定时读取目标线程的调用栈，统计各函数出现在栈中（累计）与位于栈顶（自身）的次数。
+    与cProfile不同，被分析的线程中的每次函数调用不会因此变慢。
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = 0.005):
+        """
+        :param thread_id: 需要采样的线程，默认为当前线程。
+        :param interval: 采样间隔（秒）。
+        """
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()  # 调用栈（由外到内） -> 采样次数
+        self.samples = 0
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code is handle_run:  # 只保留事件循环正在执行的回调，省略每个样本都相同的外层调用
+                break
+            if code is run_once:  # 事件循环正在等待事件
+                stack = [idle_frame]
+                break
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def run(self, duration: float):
+        """
+        在调用线程中持续采样duration秒，应在被分析线程以外的线程中调用。
+        """
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            self.sample()
+            time.sleep(self.interval)
+
+    @staticmethod
+    def frame_name(frame: tuple) -> str:
+        filename, lineno, name = frame
+        if not filename:
+            return name
+        return f'{display_pathname(filename)}:{lineno}({name})'
+
+    def top(self, n: int = 15) -> List[Tuple[str, int, int]]:
+        """
+        :return: 按累计采样次数排序的函数：(函数, 累计次数, 自身次数)
+        """
+        cumulative = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack):
+                cumulative[frame] += count
+            own[stack[-1]] += count
+        return [(self.frame_name(frame), count, own[frame]) for frame, count in cumulative.most_common(n)]
+
+    def collapsed(self) -> str:
+        """
+        :return: 折叠栈格式的文本，每行为“外层;...;内层 次数”，可用于flamegraph.pl或speedscope
+        """
+        return '\n'.join(f'{";".join(self.frame_name(frame) for frame in stack)} {count}'
+                         for stack, count in self.stacks.items()) + '\n'
+
+    def dump(self) -> str:
+        """
+        将折叠栈保存到缓存目录。
+        :return: 文件的绝对路径
+        """
+        os.makedirs(cache_path, exist_ok=True)
+        path = os.path.join(cache_path, f'profile_{time.strftime("%Y%m%d%H%M%S")}.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return CacheManager.track(path)
+
+
+async def profile(duration: float, interval: float = 0.005) -> SamplingProfiler:
+    """
+    对当前事件循环所在的线程采样duration秒，采样期间事件循环照常运行。
+    """
+    profiler = SamplingProfiler(interval=interval)
+    await asyncio.get_running_loop().run_in_executor(None, profiler.run, duration)
+    return profiler
+
+
+__all__ = ["SamplingProfiler", "profile"]
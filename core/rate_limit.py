@@ -0,0 +1,179 @@
+'''基于滑动窗口的频率限制器。'''
+import time
+from collections import deque, OrderedDict
+from typing import Dict, Union
+
+from apscheduler.triggers.interval import IntervalTrigger
+
+from core.scheduler import Scheduler
+
+
+class SlidingWindowLimiter:
+    """
+    滑动窗口计数器。
+    每个键最多保留limit + 1条时间戳，总键数超过max_keys时淘汰最久未活动的键，因此占用的内存有上限。
+    """
+    _instances: Dict[str, 'SlidingWindowLimiter'] = {}
+
+    def __init__(self, name: str, limit: int, window: float, max_keys: int = 10000):
+        """
+        :param name: 限制器名称，用于导出状态。
+        :param limit: 窗口内允许的最大次数。
+        :param window: 窗口长度（秒）。
+        :param max_keys: 最多跟踪的键数量。
+        """
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: OrderedDict = OrderedDict()
+        SlidingWindowLimiter._instances[name] = self
+
+    def _prune(self, hits: deque, now: float):
+        while hits and now - hits[0] > self.window:
+            hits.popleft()
+
+    def hit(self, key) -> bool:
+        """
+        记录一次触发。
+        :return: 窗口内的次数是否超过限制
+        """
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque(maxlen=self.limit + 1)
+            if len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+            self._prune(hits, now)
+        hits.append(now)
+        return len(hits) > self.limit
+
+    def count(self, key) -> int:
+        hits = self._hits.get(key)
+        if hits is None:
+            return 0
+        self._prune(hits, time.monotonic())
+        return len(hits)
+
+    def count_by_first(self, key) -> Dict:
+        """
+        统计以元组为键、且第一个元素为key的所有键，如(senderId, command)。
+        :return: 键的其余部分 -> 窗口内的次数
+        """
+        now = time.monotonic()
+        counts = {}
+        for k, hits in list(self._hits.items()):
+            if isinstance(k, tuple) and k and k[0] == key:
+                self._prune(hits, now)
+                if hits:
+                    counts[k[1] if len(k) == 2 else k[1:]] = len(hits)
+        return counts
+
+    def reset(self, key):
+        self._hits.pop(key, None)
+
+    def compact(self):
+        """
+        清除窗口内已没有记录的键。
+        """
+        now = time.monotonic()
+        for key in list(self._hits):
+            hits = self._hits[key]
+            self._prune(hits, now)
+            if not hits:
+                del self._hits[key]
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        state = {}
+        for key, hits in self._hits.items():
+            active = sum(1 for x in hits if now - x <= self.window)
+            if active:
+                state[key] = active
+        return {'limit': self.limit, 'window': self.window, 'keys': len(self._hits), 'counts': state}
+
+
+class TempBanList:
+    """
+    带有过期时间的临时封禁列表。
+    """
+    _instances: Dict[str, 'TempBanList'] = {}
+
+    def __init__(self, name: str, duration: float, max_keys: int = 10000):
+        self.name = name
+        self.duration = duration
+        self.max_keys = max_keys
+        self._list: OrderedDict = OrderedDict()
+        TempBanList._instances[name] = self
+
+    def add(self, key):
+        self._list.pop(key, None)
+        self._list[key] = {'count': 1, 'ts': time.monotonic()}
+        if len(self._list) > self.max_keys:
+            self._list.popitem(last=False)
+
+    def get(self, key) -> Union[dict, None]:
+        """
+        :return: 未过期的封禁记录（包含count与ts），若不存在或已过期则返回None
+        """
+        ban = self._list.get(key)
+        if ban is not None and time.monotonic() - ban['ts'] >= self.duration:
+            del self._list[key]
+            return None
+        return ban
+
+    def remaining(self, key) -> int:
+        ban = self.get(key)
+        if ban is None:
+            return 0
+        return int(self.duration - (time.monotonic() - ban['ts']))
+
+    def remove(self, key) -> bool:
+        return self._list.pop(key, None) is not None
+
+    def compact(self):
+        now = time.monotonic()
+        for key in list(self._list):
+            if now - self._list[key]['ts'] >= self.duration:
+                del self._list[key]
+
+    def state(self) -> dict:
+        return {key: {'count': ban['count'], 'remaining': self.remaining(key)} for key, ban in
+                list(self._list.items()) if self.get(key) is not None}
+
+
+def dump_state(key=None) -> dict:
+    """
+    导出所有限制器的状态。
+    :param key: 若指定，则只导出该键（通常为senderId）的状态。
+                对于以(key, ...)元组为键的限制器（如按命令计数的counter_same），导出的是“键的其余部分 -> 次数”的字典，
+                其余限制器为该键的次数。
+    """
+    state = {}
+    for name, limiter in SlidingWindowLimiter._instances.items():
+        if key is None:
+            state[name] = limiter.state()
+        else:
+            state[name] = limiter.count_by_first(key) or limiter.count(key)
+    for name, ban_list in TempBanList._instances.items():
+        if key is None:
+            state[name] = ban_list.state()
+        else:
+            ban = ban_list.get(key)
+            state[name] = None if ban is None else {'count': ban['count'], 'remaining': ban_list.remaining(key)}
+    return state
+
+
+async def compact_all():
+    for limiter in SlidingWindowLimiter._instances.values():
+        limiter.compact()
+    for ban_list in TempBanList._instances.values():
+        ban_list.compact()
+
+
+Scheduler.add_job(func=compact_all, trigger=IntervalTrigger(minutes=5), id='compact_rate_limit',
+                  replace_existing=True)
+
+__all__ = ["SlidingWindowLimiter", "TempBanList", "dump_state"]
@@ -0,0 +1,86 @@
+'''按消息记录各阶段的用时，处理时间超过阈值的消息会被写入慢命令日志。'''
+import contextvars
+import os
+import time
+import traceback
+import uuid
+
+import ujson as json
+
+from config import cfg
+from core.logger import Logger
+
+default_slow_command_threshold = 3  # 配置文件中未设置slow_command_threshold时使用
+slow_command_log = os.path.abspath('./logs/slow_commands.log')  # 每行为一条JSON记录
+
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+def slow_command_threshold() -> float:
+    """
+    :return: 处理用时超过此秒数的消息会被记录
+    """
+    return cfg.get_float('slow_command_threshold', default_slow_command_threshold)
+
+
+class Trace:
+    """
+    一条消息从接收到处理完成的过程。在with块中执行的代码（包括其中await的协程）记录的span都会归入此Trace。
+    """
+
+    def __init__(self, target: str, sender: str, message: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.target = target
+        self.sender = sender
+        self.message = message
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []  # (名称, 开始时间（相对于Trace开始）, 用时)
+        self.token = None
+
+    def record(self, name: str, start: float, duration: float):
+        self.spans.append((name, start - self.start, duration))
+
+    def __enter__(self):
+        self.token = current_trace.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        current_trace.reset(self.token)
+        self.duration = time.perf_counter() - self.start
+        if self.duration >= slow_command_threshold():
+            self.write()
+
+    def breakdown(self) -> dict:
+        """
+        :return: 各span名称的总用时
+        """
+        total = {}
+        for name, _, duration in self.spans:
+            total[name] = total.get(name, 0) + duration
+        return {k: round(v, 6) for k, v in total.items()}
+
+    def to_dict(self) -> dict:
+        return {'trace_id': self.id,
+                'ts': self.ts,
+                'target': self.target,
+                'sender': self.sender,
+                'message': self.message,
+                'duration': round(self.duration, 6) if self.duration is not None else None,
+                'breakdown': self.breakdown(),
+                'spans': [{'name': name, 'start': round(start, 6), 'duration': round(duration, 6)}
+                          for name, start, duration in self.spans]}
+
+    def write(self):
+        line = json.dumps(self.to_dict(), ensure_ascii=False)
+        Logger.warn(f'Slow command ({self.duration:.2f}s): {line}')
+        try:
+            os.makedirs(os.path.dirname(slow_command_log), exist_ok=True)
+            with open(slow_command_log, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError:
+            Logger.error(traceback.format_exc())
+
+
+__all__ = ["Trace", "current_trace"]
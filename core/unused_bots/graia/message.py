@@ -53,7 +53,7 @@ class MessageSession(MS):
     async def sendMessage(self, msgchain, quote=True):
         msgchain = await msgchain_gen(msgchain)
         if Config('qq_msg_logging_to_db') and self.session.message:
-            LoggerMSG(userid=self.target.senderId, command=self.trigger_msg, msg=msgchain.asDisplay())
+            await LoggerMSG(userid=self.target.senderId, command=self.trigger_msg, msg=msgchain.asDisplay())
         if isinstance(self.session.target, Group) or self.target.targetFrom == 'QQ|Group':
             send = await app.sendGroupMessage(self.session.target, msgchain, quote=self.session.message[Source][0].id
             if quote and self.session.message else None)
@@ -4,15 +4,18 @@ import traceback
 import uuid
 from os.path import abspath
 from typing import Union
+from urllib.parse import urlparse
 
 import aiohttp
-import filetype as ft
 import ujson as json
 from tenacity import retry, wait_fixed, stop_after_attempt
 
+from core.cache import CacheManager
+from core.downloader import download
 from core.elements import PrivateAssets
 from core.loader import load_modules
 from core.logger import Logger
+from core.metrics import external_api_seconds
 
 
 def init() -> None:
@@ -45,20 +48,21 @@ async def get_url(url: str, status_code: int = False, headers: dict = None, fmt=
     :param log: 是否输出日志。
     :returns: 指定url的内容（字符串）。
     """
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=20), headers=headers) as req:
-            if log:
-                Logger.info(await req.read())
-            if status_code and req.status != status_code:
-                raise ValueError(f'{str(req.status)}[Ke:Image,path=https://http.cat/{str(req.status)}.jpg]')
-            if fmt is not None:
-                if hasattr(req, fmt):
-                    return await getattr(req, fmt)()
+    with external_api_seconds.time(urlparse(url).netloc):
+        async with aiohttp.ClientSession(headers=headers) as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=20), headers=headers) as req:
+                if log:
+                    Logger.info(await req.read())
+                if status_code and req.status != status_code:
+                    raise ValueError(f'{str(req.status)}[Ke:Image,path=https://http.cat/{str(req.status)}.jpg]')
+                if fmt is not None:
+                    if hasattr(req, fmt):
+                        return await getattr(req, fmt)()
+                    else:
+                        raise ValueError(f"NoSuchMethod: {fmt}")
                 else:
-                    raise ValueError(f"NoSuchMethod: {fmt}")
-            else:
-                text = await req.text()
-                return text
+                    text = await req.text()
+                    return text
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(3), reraise=True)
@@ -74,20 +78,14 @@ async def post_url(url: str, data: any, headers: dict = None):
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(3), reraise=True)
-async def download_to_cache(link: str) -> Union[str, bool]:
+async def download_to_cache(link: str, dedup: bool = False) -> Union[str, bool]:
     '''利用AioHttp下载指定url的内容，并保存到缓存（./cache目录）。
 
     :param link: 需要获取的link。
+    :param dedup: 是否复用此前下载过的相同url的文件。
     :returns: 文件的相对路径，若获取失败则返回False。'''
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(link) as resp:
-                res = await resp.read()
-                ftt = ft.match(res).extension
-                path = abspath(f'./cache/{str(uuid.uuid4())}.{ftt}')
-                with open(path, 'wb+') as file:
-                    file.write(res)
-                    return path
+        return CacheManager.track(await download(link, abspath('./cache/'), dedup=dedup), 'download')
     except:
         Logger.error(traceback.format_exc())
         return False
@@ -1,18 +1,12 @@
-import os
 import re
 import traceback
-import uuid
 from html import escape
 from typing import List, Union
 
-import aiohttp
-import ujson as json
 from tabulate import tabulate
 
-from config import Config
 from core.logger import Logger
-
-web_render = Config('web_render')
+from core.utils.web_render import render, web_render
 
 
 class ImageTable:
@@ -55,16 +49,7 @@ async def image_table_render(table: Union[ImageTable, List[ImageTable]]):
               text-align: left;
             }</style>"""
         html = {'content': tblst + css, 'width': w}
-        picname = os.path.abspath(f'./cache/{str(uuid.uuid4())}.jpg')
-        if os.path.exists(picname):
-            os.remove(picname)
-        async with aiohttp.ClientSession() as session:
-            async with session.post(web_render, headers={
-                'Content-Type': 'application/json',
-            }, data=json.dumps(html)) as resp:
-                with open(picname, 'wb+') as jpg:
-                    jpg.write(await resp.read())
-        return picname
+        return await render(html)
     except Exception:
         Logger.error(traceback.format_exc())
         return False
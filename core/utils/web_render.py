@@ -0,0 +1,118 @@
+'''带有内容寻址缓存的web_render渲染。'''
+import hashlib
+import os
+import traceback
+from collections import OrderedDict
+from typing import Union
+
+import aiohttp
+import ujson as json
+
+from config import Config
+from core.logger import Logger
+from core.metrics import external_api_seconds
+
+web_render = Config('web_render')
+
+render_cache_path = os.path.abspath('./cache/render/')  # 此目录不会在重启时被清除
+render_cache_index = os.path.join(render_cache_path, 'index.json')
+render_cache_max_size = 256 * 1024 * 1024
+
+
+class RenderCache:
+    """
+    以渲染内容的哈希为键的图片缓存，按LRU顺序淘汰，总大小不超过render_cache_max_size。
+    索引保存在index.json中，重启后仍然有效。
+    """
+    _index: OrderedDict = OrderedDict()  # 哈希 -> 文件大小，越靠后越近被使用
+    _size = 0
+    _loaded = False
+
+    @staticmethod
+    def path(key: str) -> str:
+        return os.path.join(render_cache_path, f'{key}.jpg')
+
+    @staticmethod
+    def load():
+        RenderCache._loaded = True
+        if not os.path.exists(render_cache_path):
+            os.makedirs(render_cache_path)
+        try:
+            with open(render_cache_index, 'r') as f:
+                index = json.loads(f.read())
+        except (OSError, ValueError):
+            index = []
+        for key, size in index:
+            if os.path.exists(RenderCache.path(key)):
+                RenderCache._index[key] = size
+                RenderCache._size += size
+
+    @staticmethod
+    def save():
+        with open(render_cache_index, 'w') as f:
+            f.write(json.dumps([[key, size] for key, size in RenderCache._index.items()]))
+
+    @staticmethod
+    def get(key: str) -> Union[str, None]:
+        if not RenderCache._loaded:
+            RenderCache.load()
+        if key not in RenderCache._index:
+            return None
+        path = RenderCache.path(key)
+        if not os.path.exists(path):
+            RenderCache._size -= RenderCache._index.pop(key)
+            return None
+        RenderCache._index.move_to_end(key)
+        return path
+
+    @staticmethod
+    def put(key: str, data: bytes) -> str:
+        if not RenderCache._loaded:
+            RenderCache.load()
+        path = RenderCache.path(key)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if key in RenderCache._index:
+            RenderCache._size -= RenderCache._index.pop(key)
+        RenderCache._index[key] = len(data)
+        RenderCache._size += len(data)
+        while RenderCache._size > render_cache_max_size and len(RenderCache._index) > 1:
+            old_key, old_size = RenderCache._index.popitem(last=False)
+            RenderCache._size -= old_size
+            try:
+                os.remove(RenderCache.path(old_key))
+            except OSError:
+                pass
+        RenderCache.save()
+        return path
+
+
+async def render(content: dict) -> Union[str, bool]:
+    """
+    将内容交由web_render渲染为图片，相同的内容会直接返回之前的渲染结果。
+
+    :param content: 需要发送至web_render的数据，如{'content': html, 'width': 500}。
+    :returns: 图片的绝对路径，若渲染失败则返回False。
+    """
+    if not web_render:
+        return False
+    payload = json.dumps(content, sort_keys=True)
+    key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    cached = RenderCache.get(key)
+    if cached is not None:
+        Logger.info('Render cache hit.')
+        return cached
+    try:
+        with external_api_seconds.time('web_render'):
+            async with aiohttp.ClientSession() as session:
+                async with session.post(web_render, headers={
+                    'Content-Type': 'application/json',
+                }, data=payload) as resp:
+                    if resp.status != 200:
+                        Logger.error(f'Web render returned {resp.status}: {await resp.text()}')
+                        return False
+                    data = await resp.read()
+        return RenderCache.put(key, data)
+    except Exception:
+        Logger.error(traceback.format_exc())
+        return False
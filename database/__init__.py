@@ -1,10 +1,19 @@
+import atexit
 import datetime
+import time
+import traceback
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
+from apscheduler.triggers.interval import IntervalTrigger
 from tenacity import retry, stop_after_attempt
 
 from config import Config
 from core.elements.message import MessageSession
 from core.elements.temp import EnabledModulesCache, SenderInfoCache
+from core.logger import Logger
+from core.metrics import db_call_seconds, db_errors_total
+from core.scheduler import Scheduler
 from database.orm import DBSession
 from database.tables import EnabledModules, SenderInfo, TargetAdmin, CommandTriggerTime, GroupAllowList
 
@@ -35,10 +44,14 @@ session = DBSession().session
 
 
 def auto_rollback_error(func):
+    name = func.__qualname__
+
     def wrapper(*args, **kwargs):
         try:
-            return func(*args, **kwargs)
+            with db_call_seconds.time(name):
+                return func(*args, **kwargs)
         except Exception as e:
+            db_errors_total.inc(name)
             session.rollback()
             raise e
 
@@ -189,31 +202,25 @@ class BotDBUtil:
                 session.commit()
 
     class CoolDown:
-        @retry(stop=stop_after_attempt(3))
-        @auto_rollback_error
         def __init__(self, msg: MessageSession, name):
             self.msg = msg
             self.name = name
-            self.query = session.query(CommandTriggerTime).filter_by(targetId=str(msg.target.targetId),
-                                                                     commandName=name).first()
-            self.need_insert = True if self.query is None else False
+            self.key = (str(msg.target.targetId), name)
+            self.timestamp = CoolDownService.get(*self.key)
+            self.need_insert = True if self.timestamp is None else False
 
         def check(self, delay):
             if not self.need_insert:
-                now = datetime.datetime.now().timestamp() - self.query.timestamp.timestamp()
+                now = datetime.datetime.now().timestamp() - self.timestamp
                 if now > delay:
                     return 0
                 return now
             return 0
 
-        @retry(stop=stop_after_attempt(3))
-        @auto_rollback_error
         def reset(self):
-            if not self.need_insert:
-                session.delete(self.query)
-                session.commit()
-            session.add_all([CommandTriggerTime(targetId=self.msg.target.targetId, commandName=self.name)])
-            session.commit()
+            self.timestamp = datetime.datetime.now().timestamp()
+            self.need_insert = False
+            CoolDownService.set(*self.key, self.timestamp)
 
     @staticmethod
     @retry(stop=stop_after_attempt(3))
@@ -226,4 +233,84 @@ class BotDBUtil:
         return False
 
 
-__all__ = ["BotDBUtil", "auto_rollback_error", "session"]
+class CoolDownService:
+    """
+    命令冷却时间的内存缓存。
+    首次读取某个(对象, 命令)时从数据库加载，之后的检查与重置都只访问内存，
+    变更由计划任务批量写回数据库，进程退出前也会写回一次。
+    缓存最多保存max_size项，超出时淘汰最久未使用的项；数据库中不存在的记录只缓存miss_ttl秒。
+    """
+    max_size = 10000
+    miss_ttl = 60
+    _cache: 'OrderedDict[Tuple[str, str], Tuple[Optional[float], float]]' = OrderedDict()  # -> (时间戳, 过期时间)
+    _dirty: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def get(targetId: str, commandName: str):
+        key = (targetId, commandName)
+        if key in CoolDownService._dirty:  # 尚未写回的记录可能已被淘汰
+            return CoolDownService._dirty[key]
+        cached = CoolDownService._cache.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            CoolDownService._cache.move_to_end(key)
+            return cached[0]
+        query = CoolDownService.query(targetId, commandName)
+        timestamp = query.timestamp.timestamp() if query is not None else None
+        CoolDownService._store(key, timestamp)
+        return timestamp
+
+    @staticmethod
+    def set(targetId: str, commandName: str, timestamp: float):
+        key = (targetId, commandName)
+        CoolDownService._store(key, timestamp)
+        CoolDownService._dirty[key] = timestamp
+
+    @staticmethod
+    def _store(key: Tuple[str, str], timestamp: Optional[float]):
+        expires = time.monotonic() + CoolDownService.miss_ttl if timestamp is None else float('inf')
+        CoolDownService._cache[key] = (timestamp, expires)
+        CoolDownService._cache.move_to_end(key)
+        while len(CoolDownService._cache) > CoolDownService.max_size:
+            CoolDownService._cache.popitem(last=False)
+
+    @staticmethod
+    @retry(stop=stop_after_attempt(3))
+    @auto_rollback_error
+    def query(targetId: str, commandName: str):
+        return session.query(CommandTriggerTime).filter_by(targetId=targetId, commandName=commandName).first()
+
+    @staticmethod
+    @retry(stop=stop_after_attempt(3))
+    @auto_rollback_error
+    def flush():
+        if not CoolDownService._dirty:
+            return
+        dirty = CoolDownService._dirty
+        CoolDownService._dirty = {}
+        try:
+            for key in dirty:
+                session.merge(CommandTriggerTime(targetId=key[0], commandName=key[1],
+                                                 timestamp=datetime.datetime.fromtimestamp(dirty[key])))
+            session.commit()
+        except Exception as e:
+            for key in dirty:
+                CoolDownService._dirty.setdefault(key, dirty[key])
+            raise e
+
+
+async def flush_cooldown():
+    CoolDownService.flush()
+
+
+def flush_cooldown_on_exit():
+    try:
+        CoolDownService.flush()
+    except Exception:
+        Logger.error(traceback.format_exc())
+
+
+Scheduler.add_job(func=flush_cooldown, trigger=IntervalTrigger(seconds=10), id='flush_cooldown',
+                  replace_existing=True)
+atexit.register(flush_cooldown_on_exit)
+
+__all__ = ["BotDBUtil", "CoolDownService", "auto_rollback_error", "session"]
@@ -1,14 +1,22 @@
+import asyncio
+import atexit
 import datetime
+import hashlib
+import traceback
 
 import ujson as json
-from sqlalchemy import create_engine, Column, String, Text, Integer, TIMESTAMP, text
+from sqlalchemy import create_engine, event, Column, String, Text, Integer, TIMESTAMP, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import func
 from tenacity import retry, stop_after_attempt
 
+from config import cfg
+from core.logger import Logger
+
 Base = declarative_base()
 
-DB_LINK = 'sqlite:///database/msg.db'
+DB_LINK = cfg.get_str('msg_db_path', 'sqlite:///database/msg.db')
 
 
 class MSG(Base):
@@ -20,14 +28,16 @@ class MSG(Base):
 
 
 class DirtyFilterTable(Base):
-    __tablename__ = "filter_cache"
-    desc = Column(Text, primary_key=True)
+    __tablename__ = "filter_cache_v2"
+    descHash = Column(String(64), primary_key=True)
+    desc = Column(Text)
     result = Column(Text)
-    timestamp = Column(TIMESTAMP, default=text('CURRENT_TIMESTAMP'))
+    timestamp = Column(TIMESTAMP, default=text('CURRENT_TIMESTAMP'), index=True)
 
 
 class UnfriendlyActionsTable(Base):
     __tablename__ = "unfriendly_action"
+    __table_args__ = (Index('ix_unfriendly_action_target_timestamp', 'targetId', 'timestamp'),)
     id = Column(Integer, primary_key=True)
     targetId = Column(String(512))
     senderId = Column(String(512))
@@ -38,16 +48,28 @@ class UnfriendlyActionsTable(Base):
 class MSGDBSession:
     def __init__(self):
         self.engine = engine = create_engine(DB_LINK)
+        event.listen(engine, 'connect', self.set_sqlite_pragma)
         Base.metadata.create_all(bind=engine, checkfirst=True)
+        for table in Base.metadata.sorted_tables:  # create_all不会为已存在的表补建索引
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         self.Session = sessionmaker()
         self.Session.configure(bind=self.engine)
 
+    @staticmethod
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
     @property
     def session(self):
         return self.Session()
 
 
-session = MSGDBSession().session
+msg_db = MSGDBSession()
+session = msg_db.session
 
 
 def auto_rollback_error(func):
@@ -61,9 +83,89 @@ def auto_rollback_error(func):
     return wrapper
 
 
-def LoggerMSG(userid, command, msg):
-    session.add_all([MSG(targetId=userid, command=command, message=msg)])
-    session.commit()
+class MSGLogWriter:
+    """
+    消息日志的批量写入器。
+    消息先进入缓冲区，每满max_rows条或每隔interval毫秒在一个事务中写入数据库；
+    缓冲区满时写入方会等待，直到后台任务腾出空间；进程退出前会写入缓冲区中剩余的消息。
+    """
+
+    def __init__(self, max_rows: int = 100, interval: int = 500, max_buffer: int = 2000):
+        self.max_rows = max_rows
+        self.interval = interval / 1000
+        self.max_buffer = max_buffer
+        self.queue = None
+        self.task = None
+        self.pending = []  # 已从队列取出、尚未交给写入线程的消息
+        self.session = msg_db.session
+
+    async def put(self, row: MSG):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_buffer)
+        if self.task is None or self.task.done():
+            if self.task is not None and not self.task.cancelled() and self.task.exception() is not None:
+                Logger.warn(f'Message log writer stopped unexpectedly ({self.task.exception()!r}), restarting...')
+            # 沿用原有的队列，其中的消息与上次未写入的消息由新的任务继续写入
+            self.task = asyncio.ensure_future(self.run())
+        await self.queue.put(row)
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            rows = self.pending = self.pending or [await self.queue.get()]
+            deadline = loop.time() + self.interval
+            while len(rows) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.pending = []  # 交给写入线程后由线程池保证完成，退出时不再重复写入
+            try:
+                await loop.run_in_executor(None, self.commit, rows)
+            except Exception:
+                traceback.print_exc()
+
+    @retry(stop=stop_after_attempt(3))
+    def commit(self, rows: list):
+        try:
+            self.session.add_all(rows)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise e
+
+    def flush(self):
+        """
+        同步写入缓冲区中剩余的消息，在事件循环停止后调用。
+        """
+        rows = self.pending
+        self.pending = []
+        if self.queue is not None:
+            while not self.queue.empty():
+                rows.append(self.queue.get_nowait())
+        if rows:
+            try:
+                self.commit(rows)
+            except Exception:
+                traceback.print_exc()
+
+
+msg_log_writer = MSGLogWriter()
+atexit.register(msg_log_writer.flush)
+
+
+async def LoggerMSG(userid, command, msg):
+    await msg_log_writer.put(MSG(targetId=userid, command=command, message=msg))
+
+
+dirty_word_cache_expire = 86400
+
+
+def hash_desc(desc: str) -> str:
+    return hashlib.sha256(desc.encode('utf-8')).hexdigest()
 
 
 class DirtyWordCache:
@@ -71,19 +173,23 @@ class DirtyWordCache:
     @auto_rollback_error
     def __init__(self, query_word):
         self.query_word = query_word
-        self.query = session.query(DirtyFilterTable).filter_by(desc=self.query_word).first()
-        self.need_insert = False
-        if self.query is None:
-            self.need_insert = True
-        if self.query is not None and datetime.datetime.now().timestamp() - self.query.timestamp.timestamp() > 86400:
-            session.delete(self.query)
-            session.commit()
-            self.need_insert = True
+        self.desc_hash = hash_desc(query_word)
+        expired_before = datetime.datetime.now() - datetime.timedelta(seconds=dirty_word_cache_expire)
+        self.query = session.query(DirtyFilterTable).filter(DirtyFilterTable.descHash == self.desc_hash,
+                                                            DirtyFilterTable.timestamp > expired_before).first()
+        self.need_insert = self.query is None or self.query.desc != self.query_word
 
     @retry(stop=stop_after_attempt(3))
     @auto_rollback_error
     def update(self, result: dict):
-        session.add_all([DirtyFilterTable(desc=self.query_word, result=json.dumps(result))])
+        query = session.query(DirtyFilterTable).filter_by(descHash=self.desc_hash).first()
+        if query is None:
+            session.add_all([DirtyFilterTable(descHash=self.desc_hash, desc=self.query_word,
+                                              result=json.dumps(result))])
+        else:
+            query.desc = self.query_word
+            query.result = json.dumps(result)
+            query.timestamp = func.current_timestamp()
         session.commit()
 
     def get(self):
@@ -93,6 +199,20 @@ class DirtyWordCache:
             return False
 
 
+@retry(stop=stop_after_attempt(3))
+@auto_rollback_error
+def purge_dirty_word_cache() -> int:
+    """
+    批量删除已过期的审核缓存。
+    :return: 被删除的条数
+    """
+    expired_before = datetime.datetime.now() - datetime.timedelta(seconds=dirty_word_cache_expire)
+    count = session.query(DirtyFilterTable).filter(DirtyFilterTable.timestamp <= expired_before) \
+        .delete(synchronize_session=False)
+    session.commit()
+    return count
+
+
 class UnfriendlyActions:
     def __init__(self, targetId, senderId):
         self.targetId = targetId
@@ -105,27 +225,35 @@ class UnfriendlyActions:
 
         :return: True = yes, False = no
         """
-        query = session.query(UnfriendlyActionsTable).filter_by(targetId=self.targetId).all()
-        unfriendly_list = []
-        for records in query:
-            if datetime.datetime.now().timestamp() - records.timestamp.timestamp() < 432000:
-                unfriendly_list.append(records)
-        if len(unfriendly_list) > 5:
+        now = datetime.datetime.now()
+        total = session.query(func.count(UnfriendlyActionsTable.id)) \
+            .filter(UnfriendlyActionsTable.targetId == self.targetId,
+                    UnfriendlyActionsTable.timestamp > now - datetime.timedelta(seconds=432000)).scalar()
+        if total > 5:
             return True
-        count = {}
-        for criminal in unfriendly_list:
-            if datetime.datetime.now().timestamp() - criminal.timestamp.timestamp() < 86400:
-                if criminal.senderId not in count:
-                    count[criminal.senderId] = 0
-                else:
-                    count[criminal.senderId] += 1
+        count = session.query(UnfriendlyActionsTable.senderId, func.count(UnfriendlyActionsTable.id)) \
+            .filter(UnfriendlyActionsTable.targetId == self.targetId,
+                    UnfriendlyActionsTable.timestamp > now - datetime.timedelta(seconds=86400)) \
+            .group_by(UnfriendlyActionsTable.senderId).all()
         if len(count) >= 3:
             return True
         for convict in count:
-            if count[convict] >= 3:
+            if convict[1] > 3:
                 return True
         return False
 
+    @retry(stop=stop_after_attempt(3))
+    @auto_rollback_error
+    def purge(self):
+        """
+        删除此对象超过最长统计窗口（5天）的记录。
+        """
+        expired_before = datetime.datetime.now() - datetime.timedelta(seconds=432000)
+        session.query(UnfriendlyActionsTable).filter(UnfriendlyActionsTable.targetId == self.targetId,
+                                                     UnfriendlyActionsTable.timestamp <= expired_before) \
+            .delete(synchronize_session=False)
+        session.commit()
+
     @retry(stop=stop_after_attempt(3))
     @auto_rollback_error
     def add_and_check(self, action='default') -> bool:
@@ -135,4 +263,5 @@ class UnfriendlyActions:
         """
         session.add_all([UnfriendlyActionsTable(targetId=self.targetId, senderId=self.senderId, action=action)])
         session.commit()
+        self.purge()
         return self.check_mute()
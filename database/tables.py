@@ -32,9 +32,9 @@ class TargetAdmin(Base):
 
 class CommandTriggerTime(Base):
     """命令触发时间"""
-    __tablename__ = "CommandTriggerTime"
-    targetId = Column(String(512), primary_key=True)
-    commandName = Column(String(512))
+    __tablename__ = "CommandTriggerTimeV2"
+    targetId = Column(String(128), primary_key=True)  # utf8mb4下联合主键不能超过3072字节
+    commandName = Column(String(128), primary_key=True)
     timestamp = Column(TIMESTAMP, default=text('CURRENT_TIMESTAMP'))
 
 
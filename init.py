@@ -5,11 +5,20 @@ from config import Config
 from database import BotDBUtil
 
 
+persistent_cache_dirs = ['render']  # 重启时保留的缓存目录
+
+
 def init_bot():
     cache_path = os.path.abspath('./cache/')
     if os.path.exists(cache_path):
-        shutil.rmtree(cache_path)
-        os.mkdir(cache_path)
+        for x in os.listdir(cache_path):
+            if x in persistent_cache_dirs:
+                continue
+            path = os.path.join(cache_path, x)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
     else:
         os.mkdir(cache_path)
 
@@ -13,7 +13,7 @@ from core.utils import download_to_cache
 from core.utils.image_table import image_table_render, ImageTable
 from database import BotDBUtil
 from .dbutils import WikiTargetInfo, Audit, BindInfo, Prefix
-from .getinfobox import get_infobox_pic
+from .getinfobox import get_infobox_pic_cached
 from .utils.ab import ab
 from .utils.ab_qq import ab_qq
 from .utils.newbie import newbie
@@ -434,7 +434,7 @@ async def query_pages(msg: MessageSession, title: Union[str, list, tuple],
                     if plain_slice:
                         msg_list.append(Plain('\n'.join(plain_slice)))
                     if r.file is not None:
-                        dl = await download_to_cache(r.file)
+                        dl = await download_to_cache(r.file, dedup=True)
                         guess_type = filetype.guess(dl)
                         if guess_type is not None:
                             if guess_type.extension in ["png", "gif", "jpg", "jpeg", "webp", "bmp", "ico"]:
@@ -445,7 +445,7 @@ async def query_pages(msg: MessageSession, title: Union[str, list, tuple],
                                     msg_list.append(Voice(dl))
                     else:
                         if msg.Feature.image and r.link is not None:
-                            web_render_list.append({r.link: r.info.realurl})
+                            web_render_list.append((r.link, r.info.realurl, r.revision))
                 else:
                     plain_slice = []
                     wait_plain_slice = []
@@ -471,14 +471,12 @@ async def query_pages(msg: MessageSession, title: Union[str, list, tuple],
     if msg_list:
         await msg.sendMessage(msg_list)
     if web_render_list and msg.Feature.image:
-        infobox_msg_list = []
-        for i in web_render_list:
-            for ii in i:
-                get_infobox = await get_infobox_pic(i[ii], ii, headers)
-                if get_infobox:
-                    infobox_msg_list.append(Image(get_infobox))
-        if infobox_msg_list:
-            await msg.sendMessage(infobox_msg_list, quote=False)
+        render_tasks = [get_infobox_pic_cached(realurl, link, headers, revision)
+                        for link, realurl, revision in web_render_list]
+        for render_task in asyncio.as_completed(render_tasks):
+            get_infobox = await render_task
+            if get_infobox:
+                await msg.sendMessage([Image(get_infobox)], quote=False)
     if wait_msg_list:
         confirm = await msg.waitConfirm(wait_msg_list)
         if confirm and wait_list:
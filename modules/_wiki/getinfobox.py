@@ -1,18 +1,44 @@
+import asyncio
 import os
 import re
 import traceback
-import uuid
+from collections import OrderedDict
 from typing import Union
 from urllib.parse import urljoin
 
 import aiohttp
-import ujson as json
 from bs4 import BeautifulSoup
 
-from config import Config
 from core.logger import Logger
+from core.utils.web_render import render, web_render
 
-web_render = Config('web_render')
+render_semaphore = None  # 限制同时进行的渲染数量，在事件循环中首次使用时创建
+max_render_tasks = 3
+infobox_cache = OrderedDict()  # (页面链接, 修订版本号) -> 渲染结果路径
+max_infobox_cache = 128
+
+
+async def get_infobox_pic_cached(link, page_link, headers, revision: int = None) -> Union[str, bool]:
+    """
+    带有并发限制与缓存的get_infobox_pic。
+    :param revision: 页面的修订版本号，为None时不使用缓存
+    """
+    global render_semaphore
+    key = (page_link, revision)
+    if revision is not None:
+        cached = infobox_cache.get(key)
+        if cached is not None and os.path.exists(cached):
+            infobox_cache.move_to_end(key)
+            return cached
+    if render_semaphore is None:
+        render_semaphore = asyncio.Semaphore(max_render_tasks)
+    async with render_semaphore:
+        picname = await get_infobox_pic(link, page_link, headers)
+    if picname and revision is not None:
+        infobox_cache[key] = picname
+        if len(infobox_cache) > max_infobox_cache:
+            infobox_cache.popitem(last=False)
+    return picname
 
 
 async def get_infobox_pic(link, page_link, headers) -> Union[str, bool]:
@@ -30,12 +56,8 @@ async def get_infobox_pic(link, page_link, headers) -> Union[str, bool]:
             traceback.print_exc()
             return False
         soup = BeautifulSoup(html, 'html.parser')
-        pagename = uuid.uuid4()
-        url = os.path.abspath(f'./cache/{pagename}.html')
-        if os.path.exists(url):
-            os.remove(url)
         Logger.info('Downloaded raw.')
-        open_file = open(url, 'a', encoding='utf-8')
+        content = []
         find_infobox = soup.find(class_='notaninfobox')  # 我
         if find_infobox is None:  # 找
             find_infobox = soup.find(class_='portable-infobox')  # 找
@@ -58,13 +80,13 @@ async def get_infobox_pic(link, page_link, headers) -> Union[str, bool]:
         for x in soup.find_all(rel='stylesheet'):
             if x.has_attr('href'):
                 x.attrs['href'] = re.sub(';', '&', urljoin(wlink, x.get('href')))
-            open_file.write(str(x))
+            content.append(str(x))
 
         for x in soup.find_all():
             if x.has_attr('href'):
                 x.attrs['href'] = re.sub(';', '&', urljoin(wlink, x.get('href')))
         for x in soup.find_all('style'):
-            open_file.write(str(x))
+            content.append(str(x))
 
         def join_url(base, target):
             target = target.split(' ')
@@ -100,12 +122,12 @@ async def get_infobox_pic(link, page_link, headers) -> Union[str, bool]:
 
         html_lang = soup.find('html').attrs.get('lang')
 
-        open_file.write(f'<body class="mw-parser-output" lang="{html_lang}">')
-        open_file.write(str(find_infobox))
-        open_file.write('</body>')
+        content.append(f'<body class="mw-parser-output" lang="{html_lang}">')
+        content.append(str(find_infobox))
+        content.append('</body>')
         if find_infobox.parent.has_attr('style'):
-            open_file.write(join_url(link, find_infobox.parent.get('style')))
-        open_file.write('<style>span.heimu a.external,\
+            content.append(join_url(link, find_infobox.parent.get('style')))
+        content.append('<style>span.heimu a.external,\
 span.heimu a.external:visited,\
 span.heimu a.extiw,\
 span.heimu a.extiw:visited {\
@@ -118,20 +140,9 @@ a .heimu,\
     background-color: #cccccc;\
     text-shadow: none;\
 }</style>')
-        open_file.close()
-        read_file = open(url, 'r', encoding='utf-8')
-        html = {'content': read_file.read()}
+        html = {'content': ''.join(content)}
         Logger.info('Start rendering...')
-        picname = os.path.abspath(f'./cache/{pagename}.jpg')
-        if os.path.exists(picname):
-            os.remove(picname)
-        async with aiohttp.ClientSession() as session:
-            async with session.post(web_render, headers={
-                'Content-Type': 'application/json',
-            }, data=json.dumps(html)) as resp:
-                with open(picname, 'wb+') as jpg:
-                    jpg.write(await resp.read())
-        return picname
+        return await render(html)
     except Exception:
         traceback.print_exc()
         return False
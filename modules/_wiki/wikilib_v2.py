@@ -81,7 +81,8 @@ class PageInfo:
                  status: bool = True,
                  before_page_property: str = 'page',
                  page_property: str = 'page',
-                 invalid_namespace: bool = False
+                 invalid_namespace: bool = False,
+                 revision: int = None
                  ):
         self.info = info
         self.title = title
@@ -95,6 +96,7 @@ class PageInfo:
         self.before_page_property = before_page_property
         self.page_property = page_property
         self.invalid_namespace = invalid_namespace
+        self.revision = revision
 
 
 class WikiLib:
@@ -253,15 +255,22 @@ class WikiLib:
 
     async def get_html_to_text(self, page_name):
         await self.fixup_wiki_info()
-        get_parse = await self.get_json(action='parse',
-                                        page=page_name,
-                                        prop='text')
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.ignore_images = True
-        h.ignore_tables = True
-        h.single_line_break = True
-        return h.handle(get_parse['parse']['text']['*'])
+        # 通常只需要序言部分；没有序言（或序言只有表格、图片）的页面再从整个页面中取第一个有文字的章节
+        for section in ({'section': 0}, {}):
+            get_parse = await self.get_json(action='parse',
+                                            page=page_name,
+                                            prop='text',
+                                            **section)
+            h = html2text.HTML2Text()
+            h.ignore_links = True
+            h.ignore_images = True
+            h.ignore_tables = True
+            h.single_line_break = True
+            h.max_length = 2000  # parse_text最多只需要前250个字符，多留一些余量以找到句末
+            text = h.handle(get_parse['parse']['text']['*'])
+            if text.strip():
+                break
+        return text
 
     async def get_wikitext(self, page_name):
         await self.fixup_wiki_info()
@@ -421,6 +430,7 @@ class WikiLib:
                     page_info.link = full_url
                     page_info.file = file
                     page_info.desc = page_desc
+                    page_info.revision = page_raw.get('lastrevid')
         interwiki_: List[Dict[str, str]] = query.get('interwiki')
         if interwiki_ is not None:
             for i in interwiki_:
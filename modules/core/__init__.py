@@ -7,11 +7,16 @@ import traceback
 import psutil
 import ujson as json
 
+from config import cfg
+from core.cache import CacheManager
 from core.component import on_command
 from core.elements import MessageSession, Command, PrivateAssets, Image, Plain
 from core.loader import ModulesManager
+from core.metrics import Metrics
+from core.profiler import profile
 from core.parser.command import CommandParser, InvalidHelpDocTypeError
 from core.parser.message import remove_temp_ban
+from core.rate_limit import dump_state
 from core.tos import pardon_user, warn_user
 from core.utils.image_table import ImageTable, image_table_render, web_render
 from database import BotDBUtil
@@ -381,6 +386,29 @@ async def _(msg: MessageSession):
     await msg.sendMessage(result)
 
 
+prof = on_command('profile', developers=['OasisAkari'], required_superuser=True)
+
+
+@prof.handle('[<seconds>] [-f] {对事件循环采样指定秒数（默认10秒），列出累计用时最多的函数}',
+             options_desc={'[-f]': '同时保存可用于生成火焰图的折叠栈文件'})
+async def _(msg: MessageSession):
+    seconds = msg.parsed_msg['<seconds>']
+    try:
+        seconds = min(max(float(seconds), 1), 120) if seconds else 10
+    except ValueError:
+        return await msg.sendMessage('采样时间必须是数字。')
+    await msg.sendMessage(f'开始采样，持续 {seconds:g} 秒。')
+    profiler = await profile(seconds)
+    if not profiler.samples:
+        return await msg.sendMessage('未采集到任何样本。')
+    msgs = [f'共 {profiler.samples} 个样本（累计/自身）：']
+    for name, cumulative, own in profiler.top():
+        msgs.append(f'{cumulative / profiler.samples:.1%} / {own / profiler.samples:.1%}  {name}')
+    if msg.parsed_msg['-f']:
+        msgs.append(f'折叠栈已保存为缓存目录下的 {os.path.basename(profiler.dump())}。')
+    await msg.sendMessage('\n'.join(msgs), disable_secret_check=True)
+
+
 """admin = on_command('admin',
                    base=True,
                    required_admin=True,
@@ -486,6 +514,18 @@ async def _(msg: MessageSession):
     await msg.sendMessage(f'成功解除 {user} 的临时封禁。')
 
 
+@ae.handle('limit <user>')
+async def _(msg: MessageSession):
+    user = msg.parsed_msg['<user>']
+    state = dump_state(user)
+    temp_ban = state['temp_ban_counter']
+    same = state['counter_same']
+    await msg.sendMessage(f'{user} 在最近5分钟内使用了 {state["counter_all"]} 次命令。'
+                          + (f'\n重复最多的命令：{max(same, key=same.get)}（{max(same.values())} 次）'
+                             if isinstance(same, dict) else '')
+                          + (f'\n临时封禁中，剩余 {temp_ban["remaining"]} 秒。' if temp_ban else ''))
+
+
 @ae.handle('ban <user>')
 async def _(msg: MessageSession):
     user = msg.parsed_msg['<user>']
@@ -500,6 +540,55 @@ async def _(msg: MessageSession):
         await msg.sendMessage(f'成功解除 {user} 的封禁。')
 
 
+cache = on_command('cache', developers=['OasisAkari'], required_superuser=True)
+
+
+@cache.handle()
+async def _(msg: MessageSession):
+    CacheManager.scan()
+    usage = CacheManager.usage()
+    await msg.sendMessage('\n'.join(f'{name}：{x["files"]} 个文件，{x["size"] / 1048576:.2f}/{x["quota"] / 1048576:.0f} MiB'
+                                     for name, x in usage.items()))
+
+
+@cache.handle('clean {清理过期与超出配额的缓存文件}')
+async def _(msg: MessageSession):
+    await msg.sendMessage(f'已删除 {CacheManager.evict()} 个缓存文件。')
+
+
+stats = on_command('stats', developers=['OasisAkari'], required_superuser=True)
+
+
+@stats.handle()
+async def _(msg: MessageSession):
+    summary = Metrics.summary()
+    if not summary:
+        return await msg.sendMessage('暂无统计数据。')
+    await msg.sendMessage('\n'.join(f'{name}：{count} 次，平均 {avg:.1f} ms，p95 {p95:.0f} ms，最长 {maximum:.0f} ms'
+                                     for name, count, avg, p95, maximum in summary))
+
+
+@stats.handle('prometheus {以Prometheus文本格式输出所有指标}')
+async def _(msg: MessageSession):
+    await msg.sendMessage(Metrics.render(), disable_secret_check=True)
+
+
+@stats.handle('reset {清空统计数据}')
+async def _(msg: MessageSession):
+    Metrics.reset()
+    await msg.sendMessage('已清空统计数据。')
+
+
+reload = on_command('reload', developers=['OasisAkari'], required_superuser=True)
+
+
+@reload.handle()
+async def _(msg: MessageSession):
+    changed = cfg.load()
+    await msg.sendMessage(f'已重新加载配置文件，{len(changed)} 项配置发生变化。'
+                          + ('\n数据库、缓存目录等在启动时读取的配置需重启后生效。' if changed else ''))
+
+
 """
 @on_command('set_modules', required_superuser=True, help_doc='set_modules <>')
 async def set_modules(display_msg: dict):
@@ -365,7 +365,8 @@ async def _(msg: MessageSession, ginfo, brinfo):
                         msg_lst_category.append(
                             f'#{q.id} {q.nickname}({orderId}) - {q.remark} [{q.ts.strftime("%Y/%m/%d %H:%M")}]')
 
-                query = OrderDBUtil.Order.query_all(mode=mode, remark=query_string, repoId=[repo])
+                query = OrderDBUtil.Order.query_all(mode=mode, remark=query_string, repoId=[repo],
+                                                    search_nickname=True, rank=True)
                 if len(query.queried_infos) != 0:
                     for q in query.queried_infos:
                         orderId = q.orderId
@@ -388,10 +389,8 @@ async def _(msg: MessageSession, ginfo, brinfo):
                             msg_lst_category)
                     msgs.append(ms)
                 if len(msg_lst_remark) != 0:
-                    if mode == 0:
-                        ms = m + f'{query_string}搜索到如下{len(query.queried_infos)}个结果（正序）：\n  ' + '\n  '.join(msg_lst_remark)
-                    else:
-                        ms = m + f'{query_string}搜索到如下{len(query.queried_infos)}个结果（倒序）：\n  ' + '\n  '.join(msg_lst_remark)
+                    ms = m + f'{query_string}搜索到如下{len(query.queried_infos)}个结果（按相关度排序）：\n  ' + '\n  '.join(
+                        msg_lst_remark)
                     msgs.append(ms)
 
                 if len(msg_lst_category) == 0 and len(msg_lst_remark) == 0:
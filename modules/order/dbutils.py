@@ -8,6 +8,8 @@ from tenacity import retry, stop_after_attempt
 from core.elements import MessageSession
 from database import session, auto_rollback_error
 from modules.order.orm import OrderInfo, GroupInfo, TargetAdmin, MasterInfo, DeletedRecord, RepoInfo, CategoryInfo
+from modules.order.orderbook import order_book
+from modules.order.search import search_index, like_filter, fields_all
 
 from sqlalchemy.sql import func
 from sqlalchemy import or_
@@ -46,9 +48,15 @@ class OrderDBUtil:
                 .filter(*filters).first()
             if query is not None:
                 original = getattr(query, column)
+                repo = query.repoId
                 setattr(query, column, value)
                 session.commit()
                 session.expire_all()
+                if column in ('remark', 'nickname', 'repoId'):
+                    search_index.update(query)
+                if column in ('finished', 'repoId'):
+                    order_book.remove(query.id, repo)
+                    order_book.set(query.id, query.repoId, not query.finished)
                 return original
             return False
 
@@ -58,9 +66,9 @@ class OrderDBUtil:
         def add(order_info: Union[OrderInfo]):
             session.add(order_info)
             session.commit()
-            q = session.query(OrderInfo).filter(OrderInfo.orderId == order_info.orderId,
-                                                OrderInfo.timestamp == order_info.timestamp).first()
-            return q.id
+            search_index.update(order_info)
+            order_book.set(order_info.id, order_info.repoId, not order_info.finished)
+            return order_info.id
 
         @staticmethod
         @retry(stop=stop_after_attempt(3))
@@ -72,10 +80,13 @@ class OrderDBUtil:
             for x in repoId:
                 ors.append(OrderInfo.repoId == x)
             filters.append(or_(*ors))
-            q = session.query(OrderInfo).filter(filters).first()
+            q = session.query(OrderInfo).filter(*filters).first()
             if q:
+                repo = q.repoId
                 session.delete(q)
                 session.commit()
+                search_index.remove(id)
+                order_book.remove(id, repo)
                 return True
             else:
                 return False
@@ -96,6 +107,7 @@ class OrderDBUtil:
             if q:
                 q.finished = True
                 session.commit()
+                order_book.set(q.id, q.repoId, False)
                 return True
             else:
                 return False
@@ -116,6 +128,7 @@ class OrderDBUtil:
             if q:
                 q.finished = False
                 session.commit()
+                order_book.set(q.id, q.repoId, True)
                 return True
             else:
                 return False
@@ -123,7 +136,12 @@ class OrderDBUtil:
         @staticmethod
         @retry(stop=stop_after_attempt(3))
         @auto_rollback_error
-        def query_all(id=None, orderId=None, mode=0, remark=None, showfinished=False, categoryId=None, repoId: list = None) -> QueriedInfoStack:
+        def query_all(id=None, orderId=None, mode=0, remark=None, showfinished=False, categoryId=None, repoId: list = None,
+                      search_nickname=False, rank=False) -> QueriedInfoStack:
+            """
+            :param remark: 备注中包含的关键词，search_nickname为True时也匹配昵称
+            :param rank: 指定了remark时按相关度排序，而不是按mode排序
+            """
             if mode == 0:
                 o = OrderInfo.id
             else:
@@ -135,8 +153,11 @@ class OrderDBUtil:
                 filters.append(OrderInfo.orderId == orderId)
             if not showfinished:
                 filters.append(OrderInfo.finished == False)
+            matched = None
             if remark is not None:
-                filters.append(OrderInfo.remark.like(f'%{remark}%'))
+                fields = fields_all if search_nickname else ('remark',)
+                matched = search_index.match(remark, repoId, fields)
+                filters.append(or_(*like_filter(remark, fields)))  # 索引的结果也要符合LIKE的语义
             if categoryId is not None:
                 filters.append(OrderInfo.categoryId == categoryId)
             ors = []
@@ -144,20 +165,23 @@ class OrderDBUtil:
                 for x in repoId:
                     ors.append(OrderInfo.repoId == x)
                 filters.append(or_(*ors))
-            queryAll = session.query(OrderInfo).filter(*filters).order_by(o).all()
+            if matched is None:
+                queryAll = session.query(OrderInfo).filter(*filters).order_by(o).all()
+            else:
+                queryAll = []
+                for i in range(0, len(matched), 500):
+                    queryAll += session.query(OrderInfo).filter(OrderInfo.id.in_(matched[i:i + 500]), *filters).all()
+                if rank:
+                    position = {x: i for i, x in enumerate(matched)}
+                    queryAll.sort(key=lambda x: position[x.id])
+                else:
+                    queryAll.sort(key=lambda x: x.id, reverse=mode != 0)
             if queryAll is None:
                 return QueriedInfoStack()
             else:
                 lst = []
                 for q in queryAll:
-                    qm_filters = []
-                    if ors:
-                        qm_filters.append(or_(*ors))
-                    queryAll = session.query(OrderInfo).filter(OrderInfo.finished == False,
-                                                               OrderInfo.id < q.id, *qm_filters).all()
-                    queue = 0
-                    if queryAll is not None:
-                        queue = len(queryAll)
+                    queue = order_book.count_before(q.id, repoId)
                     lst.append(QueriedInfo(id=q.id, remark=q.remark, ts=q.timestamp, queue=queue,
                                            nickname=q.nickname, orderId=q.orderId, finished=q.finished,
                                            repoId=q.repoId, categoryId=q.categoryId))
@@ -482,6 +506,8 @@ class OrderDBUtil:
             for y in o:
                 session.delete(y)
                 session.commit()
+                search_index.remove(y.id)
+                order_book.remove(y.id, y.repoId)
             c = session.query(CategoryInfo).filter_by(repoId=x.id).all()
             for y in c:
                 session.delete(y)
@@ -0,0 +1,130 @@
+'''
+各仓库未完成的单的内存索引，用于计算“前面还有N单”。
+
+每个仓库按id顺序保存其所有单，并用树状数组（Fenwick树）记录各单是否未完成，
+某个单前面的未完成单数即为前缀和，查询与更新均为O(log n)。
+启动时从数据库建立索引，之后由OrderDBUtil.Order在单被添加、完成、撤销完成、删除或修改后更新。
+'''
+from bisect import bisect_left
+from typing import Dict, Iterable, List
+
+from core.logger import Logger
+from database import session
+from modules.order.orm import OrderInfo
+
+
+class FenwickTree:
+    def __init__(self, values: Iterable[int] = ()):
+        self.values: List[int] = []
+        self.tree: List[int] = [0]  # 下标从1开始
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def prefix(self, n: int) -> int:
+        """
+        :return: 前n个值之和
+        """
+        total = 0
+        while n > 0:
+            total += self.tree[n]
+            n -= n & -n
+        return total
+
+    def append(self, value: int):
+        self.values.append(value)
+        n = len(self.values)
+        # 节点n覆盖(n - lowbit(n), n]
+        self.tree.append(value + self.prefix(n - 1) - self.prefix(n - (n & -n)))
+
+    def set(self, i: int, value: int):
+        """
+        将第i个（从0开始）值设为value。
+        """
+        delta = value - self.values[i]
+        if not delta:
+            return
+        self.values[i] = value
+        n = i + 1
+        while n < len(self.tree):
+            self.tree[n] += delta
+            n += n & -n
+
+
+class RepoQueue:
+    def __init__(self, ids: List[int] = None, opens: List[int] = None):
+        self.ids = ids or []
+        self.tree = FenwickTree(opens or [])
+
+    def set(self, id: int, open: bool):
+        i = bisect_left(self.ids, id)
+        if i < len(self.ids) and self.ids[i] == id:
+            self.tree.set(i, int(open))
+        elif i == len(self.ids):  # 新的单的id总是最大的
+            self.ids.append(id)
+            self.tree.append(int(open))
+        else:  # 单被移动到此仓库时才会出现，重新建立
+            values = self.tree.values
+            self.ids.insert(i, id)
+            values.insert(i, int(open))
+            self.tree = FenwickTree(values)
+
+    def count_before(self, id: int) -> int:
+        return self.tree.prefix(bisect_left(self.ids, id))
+
+    def count(self) -> int:
+        return self.tree.prefix(len(self.tree))
+
+
+class OrderBook:
+    def __init__(self):
+        self.repos: Dict[int, RepoQueue] = {}
+
+    def rebuild(self):
+        """
+        从数据库重新建立所有仓库的索引。
+        """
+        repos: Dict[int, RepoQueue] = {}
+        query = session.query(OrderInfo.id, OrderInfo.repoId, OrderInfo.finished).order_by(OrderInfo.id)
+        total = 0
+        for id, repoId, finished in query.yield_per(10000):
+            repo = repos.get(repoId)
+            if repo is None:
+                repo = repos[repoId] = RepoQueue()
+            repo.ids.append(id)
+            repo.tree.append(0 if finished else 1)
+            total += 1
+        self.repos = repos
+        Logger.info(f'Built the order queue index for {total} orders in {len(repos)} repos.')
+
+    def set(self, id, repoId, open: bool):
+        repoId = int(repoId)
+        repo = self.repos.get(repoId)
+        if repo is None:
+            repo = self.repos[repoId] = RepoQueue()
+        repo.set(int(id), open)
+
+    def remove(self, id, repoId):
+        repo = self.repos.get(int(repoId))
+        if repo is not None:
+            repo.set(int(id), False)
+
+    def count_before(self, id, repoId: list = None) -> int:
+        """
+        :return: 指定仓库中id小于此id的未完成单数，未指定仓库时为所有仓库
+        """
+        repos = self.repos.values() if repoId is None else [self.repos.get(x) for x in {int(x) for x in repoId}]
+        return sum(repo.count_before(int(id)) for repo in repos if repo is not None)
+
+    def count(self, repoId: list = None) -> int:
+        """
+        :return: 指定仓库中未完成的单数
+        """
+        repos = self.repos.values() if repoId is None else [self.repos.get(x) for x in {int(x) for x in repoId}]
+        return sum(repo.count() for repo in repos if repo is not None)
+
+
+order_book = OrderBook()
+order_book.rebuild()
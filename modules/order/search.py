@@ -0,0 +1,252 @@
+'''
+单的备注与昵称的全文索引，用于“查单 <备注>”。
+
+SQLite使用以二元组分词的FTS5表，MySQL使用ngram解析器的FULLTEXT索引，两者都不可用时使用进程内的二元组倒排索引。
+关键词短于索引的分词长度时返回None，由调用方退回到LIKE查询；索引返回的候选也会再以LIKE确认。
+单被添加、修改或删除后需调用update或remove；绕过OrderDBUtil批量写入单后需调用rebuild。
+'''
+import re
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import DatabaseError
+
+from core.logger import Logger
+from database import session
+from modules.order.orm import OrderInfo, engine, table_prefix
+
+order_table = OrderInfo.__tablename__
+fields_all = ('remark', 'nickname')
+
+
+class SearchIndex(ABC):
+    min_length = 1  # 能够使用索引的最短关键词
+
+    @abstractmethod
+    def match(self, keyword: str, repoId: list = None, fields: Iterable[str] = ('remark',)) \
+            -> Union[List[int], None]:
+        """
+        :param fields: 需要匹配的列，可为remark与nickname
+        :return: 匹配的单的id，按相关度从高到低排列；无法使用索引时返回None
+        """
+
+    def update(self, order: OrderInfo):
+        """单被添加或修改后调用。由数据库维护的索引无需处理。"""
+
+    def remove(self, id):
+        """单被删除后调用。"""
+
+    def rebuild(self):
+        """重新为所有单建立索引。"""
+
+
+class SQLiteFTSIndex(SearchIndex):
+    """
+    FTS5表，文本被切分为相邻两字的二元组后写入，以便检索中文等不以空格分词的文本。
+    关键词的二元组按顺序组成短语查询，结果与子串匹配一致。
+    """
+    min_length = 2
+    table = table_prefix + 'OrderSearch'
+
+    @staticmethod
+    def tokens(value: str) -> str:
+        value = (value or '').lower()
+        # 以码位的十六进制表示二元组，保证unicode61分词器将其视为一个词
+        return ' '.join(f'{ord(value[i]):x}x{ord(value[i + 1]):x}' for i in range(len(value) - 1))
+
+    def setup(self):
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.table}" '
+                              f'USING fts5(remark, nickname, repoId UNINDEXED)'))
+            indexed = conn.execute(text(f'SELECT COUNT(*) FROM "{self.table}"')).scalar()
+            total = conn.execute(text(f'SELECT COUNT(*) FROM "{order_table}"')).scalar()
+        if indexed != total:
+            self.rebuild()
+
+    def rebuild(self):
+        with engine.begin() as conn:
+            conn.execute(text(f'DELETE FROM "{self.table}"'))
+            rows = []
+            for id, repoId, remark, nickname in conn.execute(text(
+                    f'SELECT id, repoId, remark, nickname FROM "{order_table}"')).fetchall():
+                rows.append({'id': id, 'repoId': repoId, 'remark': self.tokens(remark),
+                             'nickname': self.tokens(nickname)})
+            if rows:
+                conn.execute(text(f'INSERT INTO "{self.table}"(rowid, remark, nickname, repoId) '
+                                  f'VALUES(:id, :remark, :nickname, :repoId)'), rows)
+        Logger.info(f'Built the order search index for {len(rows)} orders.')
+
+    def update(self, order):
+        session.execute(text(f'DELETE FROM "{self.table}" WHERE rowid = :id'), {'id': order.id})
+        session.execute(text(f'INSERT INTO "{self.table}"(rowid, remark, nickname, repoId) '
+                             f'VALUES(:id, :remark, :nickname, :repoId)'),
+                        {'id': order.id, 'repoId': order.repoId, 'remark': self.tokens(order.remark),
+                         'nickname': self.tokens(order.nickname)})
+        session.commit()
+
+    def remove(self, id):
+        session.execute(text(f'DELETE FROM "{self.table}" WHERE rowid = :id'), {'id': id})
+        session.commit()
+
+    def match(self, keyword, repoId=None, fields=('remark',)):
+        if len(keyword) < self.min_length:
+            return None
+        query = f'{{{" ".join(fields)}}} : "{self.tokens(keyword)}"'
+        sql = f'SELECT rowid FROM "{self.table}" WHERE "{self.table}" MATCH :query'
+        params = {'query': query}
+        if repoId is not None:
+            sql += f' AND repoId IN ({", ".join(f":r{i}" for i in range(len(repoId)))})'
+            params.update({f'r{i}': x for i, x in enumerate(repoId)})
+        sql += ' ORDER BY rank'
+        return [x[0] for x in session.execute(text(sql), params)]
+
+
+class MySQLFullTextIndex(SearchIndex):
+    """
+    使用ngram解析器的FULLTEXT索引，由MySQL维护。分词长度为服务器的ngram_token_size（默认为2）。
+    ngram解析器会丢弃包含停用词（如a、i）的词，因此建立索引与查询时都关闭停用词。
+    """
+    indexes = {('remark',): 'ft_remark_ngram', fields_all: 'ft_remark_nickname_ngram'}
+    legacy_indexes = ('ft_remark', 'ft_remark_nickname')  # 启用停用词时建立的索引
+
+    def setup(self):
+        with engine.begin() as conn:
+            conn.execute(text('SET SESSION innodb_ft_enable_stopword = OFF'))
+            existing = {x[0] for x in conn.execute(
+                text('SELECT DISTINCT index_name FROM information_schema.statistics '
+                     'WHERE table_schema = DATABASE() AND table_name = :name'), {'name': order_table})}
+            for name in self.legacy_indexes:
+                if name in existing:
+                    conn.execute(text(f'ALTER TABLE `{order_table}` DROP INDEX `{name}`'))
+            for fields, name in self.indexes.items():
+                if name not in existing:
+                    conn.execute(text(f'ALTER TABLE `{order_table}` ADD FULLTEXT INDEX `{name}` '
+                                      f'({", ".join(fields)}) WITH PARSER ngram'))
+            self.min_length = int(conn.execute(text('SELECT @@ngram_token_size')).scalar())
+
+    def match(self, keyword, repoId=None, fields=('remark',)):
+        fields = tuple(x for x in fields_all if x in fields)
+        keyword = keyword.replace('"', ' ').strip()
+        if fields not in self.indexes or len(keyword) < self.min_length:
+            return None
+        against = f'MATCH({", ".join(fields)}) AGAINST(:query IN BOOLEAN MODE)'
+        sql = f'SELECT id FROM `{order_table}` WHERE {against}'
+        params = {'query': f'"{keyword}"'}
+        if repoId is not None:
+            sql += f' AND repoId IN ({", ".join(f":r{i}" for i in range(len(repoId)))})'
+            params.update({f'r{i}': x for i, x in enumerate(repoId)})
+        sql += f' ORDER BY {against} DESC'
+        session.execute(text('SET SESSION innodb_ft_enable_stopword = OFF'))  # 连接池中的连接可能尚未设置
+        return [x[0] for x in session.execute(text(sql), params)]
+
+
+class NgramIndex(SearchIndex):
+    """
+    进程内的二元组倒排索引，首次搜索时从数据库读取全部单建立。
+    按二元组求交集得到候选后再逐一确认关键词确实出现在文本中，因此结果与LIKE一致；单字关键词直接遍历文本。
+    """
+    n = 2
+
+    def __init__(self):
+        self.loaded = False
+        self.docs: Dict[int, Tuple[int, Dict[str, str]]] = {}  # id -> (repoId, {列: 小写文本})
+        self.postings: Dict[Tuple[str, str], Set[int]] = defaultdict(set)  # (列, 二元组) -> id
+
+    def setup(self):
+        pass
+
+    def grams(self, value: str) -> Set[str]:
+        return {value[i:i + self.n] for i in range(len(value) - self.n + 1)}
+
+    def add(self, id, repoId, values: dict):
+        values = {k: (v or '').lower() for k, v in values.items()}
+        self.docs[id] = (repoId, values)
+        for field, value in values.items():
+            for gram in self.grams(value):
+                self.postings[(field, gram)].add(id)
+
+    def load(self):
+        query = session.query(OrderInfo.id, OrderInfo.repoId, OrderInfo.remark, OrderInfo.nickname)
+        for id, repoId, remark, nickname in query.yield_per(10000):
+            self.add(id, repoId, {'remark': remark, 'nickname': nickname})
+        self.loaded = True
+        Logger.info(f'Built the order search index for {len(self.docs)} orders.')
+
+    def rebuild(self):
+        self.docs.clear()
+        self.postings.clear()
+        self.load()
+
+    def update(self, order):
+        if self.loaded:
+            self.remove(order.id)
+            self.add(order.id, order.repoId, {'remark': order.remark, 'nickname': order.nickname})
+
+    def remove(self, id):
+        if not self.loaded or id not in self.docs:
+            return
+        _, values = self.docs.pop(id)
+        for field, value in values.items():
+            for gram in self.grams(value):
+                ids = self.postings.get((field, gram))
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self.postings[(field, gram)]
+
+    def match(self, keyword, repoId=None, fields=('remark',)):
+        if not self.loaded:
+            self.load()
+        keyword = keyword.lower()
+        if not keyword:
+            return None
+        repos = None if repoId is None else {int(x) for x in repoId}
+        grams = self.grams(keyword)
+        candidates = set()
+        for field in fields:
+            if grams:
+                sets = sorted((self.postings.get((field, gram), set()) for gram in grams), key=len)
+                candidates |= sets[0].intersection(*sets[1:])
+            else:
+                candidates = self.docs.keys()
+                break
+        scored = []
+        for id in candidates:
+            repo, values = self.docs[id]
+            if repos is not None and repo not in repos:
+                continue
+            hits = sum(values[field].count(keyword) for field in fields)
+            if hits:
+                length = sum(len(values[field]) for field in fields)
+                scored.append((-hits * len(keyword) / length, id))  # 关键词所占的比例越高越相关
+        return [id for _, id in sorted(scored)]
+
+
+def get_search_index() -> SearchIndex:
+    dialect = engine.dialect.name
+    backends = []
+    if dialect == 'sqlite':
+        backends.append(SQLiteFTSIndex)
+    elif dialect == 'mysql':
+        backends.append(MySQLFullTextIndex)
+    backends.append(NgramIndex)
+    for backend in backends:
+        index = backend()
+        try:
+            index.setup()
+            return index
+        except DatabaseError:
+            Logger.warn(f'Failed to set up {backend.__name__} for order search, falling back.')
+
+
+def like_filter(keyword: str, fields: Iterable[str] = ('remark',)):
+    """
+    :return: 与match相同条件的LIKE过滤条件
+    """
+    keyword = re.sub(r'([\\%_])', r'\\\1', keyword)
+    return [getattr(OrderInfo, field).like(f'%{keyword}%', escape='\\') for field in fields]
+
+
+search_index = get_search_index()